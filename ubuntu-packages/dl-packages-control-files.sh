@@ -3,10 +3,13 @@ set -ef
 
 cd -- "$( dirname -- "${BASH_SOURCE[0]}" )" &> /dev/null
 
+# Keep the control files gzipped on disk and use curl's time-conditional
+# download (`-z` sends `If-Modified-Since`), so an unchanged file on the
+# mirror costs one 304 response instead of a full re-download.
+# `dl-packages.py` decompresses the .gz on the fly while parsing.
+
 f=ubuntu_dists_noble_main_binary-amd64_Packages.gz
-curl -fsSL -o "$f" https://archive.ubuntu.com/ubuntu/dists/noble/main/binary-amd64/Packages.gz
-gunzip -f -- "$f"
+curl -fsSL -z "$f" -o "$f" https://archive.ubuntu.com/ubuntu/dists/noble/main/binary-amd64/Packages.gz
 
 f=ubuntu_dists_noble_main_binary-arm64_Packages.gz
-curl -fsSL -o "$f" https://ports.ubuntu.com/dists/noble/main/binary-arm64/Packages.gz
-gunzip -f -- "$f"
+curl -fsSL -z "$f" -o "$f" https://ports.ubuntu.com/dists/noble/main/binary-arm64/Packages.gz
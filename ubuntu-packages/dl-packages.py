@@ -1,12 +1,13 @@
 #!/usr/bin/env python3
 
+import asyncio
+import gzip
 import re
 import sys
 from dataclasses import dataclass
 from pathlib import Path, PurePosixPath
 
-import requests
-from debian import deb822
+import aiohttp
 
 # See <https://www.debian.org/doc/debian-policy/ch-controlfields.html#source>:
 # Package names (both source and binary, see Package) must consist only of lower case letters (a-z), digits
@@ -14,6 +15,14 @@ from debian import deb822
 # with an alphanumeric character.
 DEB_PACKAGE_NAME_REGEX = re.compile(r'[a-z][a-z0-9+\-.]+')
 
+# Large chunks amortize the per-chunk Python overhead of `iter_content()` over
+# far fewer iterations, which matters for multi-MB .deb files.
+HTTP_CHUNK_SIZE = 1 << 20
+
+# Number of concurrent downloads. The bottleneck is per-request round-trip
+# latency to the mirror, not bandwidth, so overlapping requests pays off.
+MAX_CONCURRENT_DOWNLOADS = 16
+
 @dataclass
 class Package:
     name: str
@@ -22,7 +31,75 @@ class Package:
     architecture: str
     source: str
 
+def iter_packages_fast(data: bytes):
+    """Yield `Package`s from the contents of a `Packages` control file.
+
+    `deb822.Packages.iter_paragraphs()` spends most of its time on per-line
+    field parsing we don't need (continuation lines, case-insensitive field
+    names, ...). We only need 5 single-line fields out of a 7 MB file, so a
+    plain `bytes.split` parser is many times faster.
+    """
+    for paragraph in data.split(b'\n\n'):
+        name = version = filename = architecture = source = None
+        for line in paragraph.split(b'\n'):
+            if line.startswith(b'Package: '):
+                name = line[len(b'Package: '):].decode('utf-8')
+            elif line.startswith(b'Version: '):
+                version = line[len(b'Version: '):].decode('utf-8')
+            elif line.startswith(b'Filename: '):
+                filename = line[len(b'Filename: '):].decode('utf-8')
+            elif line.startswith(b'Architecture: '):
+                architecture = line[len(b'Architecture: '):].decode('utf-8')
+            elif line.startswith(b'Source: '):
+                source = line[len(b'Source: '):].decode('utf-8')
+                # The Source field may carry a version in parentheses
+                # ("Source: src-pkg (1.2-3)") - drop it, like deb822 does.
+                paren_idx = source.find(' (')
+                if paren_idx != -1:
+                    source = source[:paren_idx]
+        if name is None:
+            # trailing empty paragraph
+            continue
+        if source is None:
+            # Per Debian Policy, a missing Source field means the source
+            # package has the same name as the binary package.
+            source = name
+        yield Package(name, version, PurePosixPath(filename), architecture, source)
+
+async def download_package(session: aiohttp.ClientSession, semaphore: asyncio.Semaphore, pkg: Package, packages_out_dir: Path, mirror_url: str) -> None:
+    pkg_basename = PurePosixPath(pkg.filename).name
+
+    # Everything, including opening the output file, happens only once a
+    # download slot is held: asyncio.gather starts every task eagerly, so
+    # work before the semaphore would run for all packages at once - with
+    # 'xb' that would create (and hold open) one file per package up front.
+    async with semaphore:
+        source_pkg_dir = packages_out_dir / pkg.source
+        source_pkg_dir.mkdir(exist_ok=True)
+
+        try:
+            # A 1 MiB write buffer coalesces the writes into few large syscalls.
+            o = open(source_pkg_dir / pkg_basename, 'xb', buffering=HTTP_CHUNK_SIZE)
+        except FileExistsError:
+            return
+
+        with o:
+            async with session.get(f'{mirror_url}/{pkg.filename}') as r:
+                print(r.url)
+                r.raise_for_status()
+                async for chunk in r.content.iter_chunked(HTTP_CHUNK_SIZE):
+                    o.write(chunk)
+
+async def download_packages(pkgs_to_download: list[Package], packages_out_dir: Path, mirror_url: str) -> None:
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(
+            download_package(session, semaphore, pkg, packages_out_dir, mirror_url)
+            for pkg in pkgs_to_download
+        ))
+
 def download_packages_in_manifest(manifest_path: Path, packages: dict[str, Package], packages_out_dir: Path, mirror_url: str):
+    pkgs_to_download: list[Package] = []
     with open(manifest_path, 'r', encoding='utf-8') as f:
         for line in f:
             line = line.rstrip('\n')
@@ -44,26 +121,12 @@ def download_packages_in_manifest(manifest_path: Path, packages: dict[str, Packa
                 print(f'package {name!r} not found')
                 continue
 
-            pkg_basename = PurePosixPath(pkg.filename).name
-
             if pkg.architecture not in ('amd64', 'arm64'):
                 continue
 
-            source_pkg_dir = packages_out_dir / pkg.source
-            source_pkg_dir.mkdir(exist_ok=True)
+            pkgs_to_download.append(pkg)
 
-            try:
-                o = open(source_pkg_dir / pkg_basename, 'xb')
-            except FileExistsError:
-                continue
-
-            with o:
-                # https://stackoverflow.com/a/16696317/12940655
-                with requests.get(f'{mirror_url}/{pkg.filename}', stream=True) as r:
-                    print(r.url)
-                    r.raise_for_status()
-                    for chunk in r.iter_content(chunk_size=8192):
-                        o.write(chunk)
+    asyncio.run(download_packages(pkgs_to_download, packages_out_dir, mirror_url))
 
 
 def dl_packages(arch: str, script_dir: Path, packages_out_dir: Path, mirror_url: str) -> None:
@@ -72,13 +135,20 @@ def dl_packages(arch: str, script_dir: Path, packages_out_dir: Path, mirror_url:
     elif arch == 'arm64':
         packages_control_file_name = 'ubuntu_dists_noble_main_binary-arm64_Packages'
 
-    with open(script_dir / packages_control_file_name, 'rb') as packages_file:
+    # `dl-packages-control-files.sh` keeps the control files gzipped on disk
+    # (so its conditional re-download works); fall back to an uncompressed
+    # file for backwards compatibility.
+    packages_control_file_gz = script_dir / f'{packages_control_file_name}.gz'
+    if packages_control_file_gz.exists():
+        packages_file = gzip.open(packages_control_file_gz, 'rb')
+    else:
+        packages_file = open(script_dir / packages_control_file_name, 'rb')
+
+    with packages_file:
         packages: dict[str, Package] = {}
-        for pkg in deb822.Packages.iter_paragraphs(packages_file, use_apt_pkg=False):
-            name = pkg['package']
-            filename = PurePosixPath(pkg['filename'])
-            assert pkg.source == filename.parent.name
-            packages[name] = Package(name, pkg['version'], filename, pkg['architecture'], pkg.source)
+        for pkg in iter_packages_fast(packages_file.read()):
+            assert pkg.source == pkg.filename.parent.name
+            packages[pkg.name] = pkg
 
     if arch == 'amd64':
         download_packages_in_manifest(script_dir / 'ubuntu-24.04.1-desktop-amd64.manifest', packages, packages_out_dir, mirror_url)
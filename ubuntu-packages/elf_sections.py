@@ -0,0 +1,165 @@
+"""Minimal mmap-based ELF parser for the string-extraction hot path.
+
+The generated Kaitai Struct parser (`elf.py`) eagerly builds a Python object
+for every section header and symbol table entry, which dominates the per-ELF
+cost in `extract-strings-from-elfs.py`. We only ever need the section header
+table, section bodies and `.dynsym` entries, so parse just those with
+`struct.unpack_from` and expose section bodies as zero-copy views into the
+mmapped file.
+
+Constants follow the names in <elf.h>.
+"""
+
+import mmap
+import struct
+import sys
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+ELF_MAGIC = b'\x7fELF'
+
+# e_ident[EI_CLASS]
+ELFCLASS32 = 1
+ELFCLASS64 = 2
+
+# e_ident[EI_DATA]
+ELFDATA2LSB = 1
+ELFDATA2MSB = 2
+
+# sh_type
+SHT_PROGBITS = 1
+SHT_NOBITS = 8
+SHT_DYNSYM = 11
+
+# st_info >> 4
+STB_GLOBAL = 1
+
+# st_info & 0xf
+STT_OBJECT = 1
+STT_FUNC = 2
+
+# st_shndx
+SHN_UNDEF = 0
+
+
+@dataclass(frozen=True)
+class SectionHeader:
+    name: str
+    type: int
+    ofs_body: int
+    len_body: int
+    link: int
+    entry_size: int
+
+
+@dataclass(frozen=True)
+class Symbol:
+    name: str
+    bind: int
+    type: int
+    sh_idx: int
+
+
+class ElfFile:
+    """Read-only view of an mmapped ELF file's section header table."""
+
+    def __init__(self, path: Path):
+        self._f = open(path, 'rb')
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Both extractors end up touching most of the file, so ask the kernel
+        # to read it ahead instead of faulting pages in one by one.
+        self._mm.madvise(mmap.MADV_WILLNEED)
+        mm = self._mm
+
+        assert mm[:4] == ELF_MAGIC, f'not an ELF file: {path}'
+        ei_class = mm[4]
+        ei_data = mm[5]
+        assert ei_class in (ELFCLASS32, ELFCLASS64), f'unexpected EI_CLASS {ei_class} in {path}'
+        assert ei_data in (ELFDATA2LSB, ELFDATA2MSB), f'unexpected EI_DATA {ei_data} in {path}'
+        self._is_64 = ei_class == ELFCLASS64
+        self._endian = '<' if ei_data == ELFDATA2LSB else '>'
+
+        if self._is_64:
+            (e_shoff,) = struct.unpack_from(self._endian + 'Q', mm, 0x28)
+            e_shentsize, e_shnum, e_shstrndx = struct.unpack_from(self._endian + 'HHH', mm, 0x3a)
+            # sh_name, sh_type, sh_flags, sh_addr, sh_offset, sh_size,
+            # sh_link, sh_info, sh_addralign, sh_entsize
+            shdr_fmt = self._endian + 'IIQQQQIIQQ'
+        else:
+            (e_shoff,) = struct.unpack_from(self._endian + 'I', mm, 0x20)
+            e_shentsize, e_shnum, e_shstrndx = struct.unpack_from(self._endian + 'HHH', mm, 0x2e)
+            shdr_fmt = self._endian + 'IIIIIIIIII'
+        assert e_shentsize == struct.calcsize(shdr_fmt), f'unexpected e_shentsize {e_shentsize} in {path}'
+
+        raw_headers = [
+            struct.unpack_from(shdr_fmt, mm, e_shoff + i * e_shentsize)
+            for i in range(e_shnum)
+        ]
+        # The field order is the same for ELF32 and ELF64.
+        shstrtab_ofs = raw_headers[e_shstrndx][4]
+        self.section_headers: list[SectionHeader] = [
+            SectionHeader(
+                name=self._strtab_lookup(shstrtab_ofs, sh_name),
+                type=sh_type,
+                ofs_body=sh_offset,
+                len_body=sh_size,
+                link=sh_link,
+                entry_size=sh_entsize,
+            )
+            for sh_name, sh_type, _, _, sh_offset, sh_size, sh_link, _, _, sh_entsize in raw_headers
+        ]
+
+    def _strtab_lookup(self, strtab_ofs: int, name_ofs: int) -> str:
+        start = strtab_ofs + name_ofs
+        end = self._mm.find(b'\x00', start)
+        assert end != -1
+        return self._mm[start:end].decode('utf-8')
+
+    @property
+    def raw(self) -> mmap.mmap:
+        """The whole file as the underlying mmap."""
+        return self._mm
+
+    def section_body(self, header: SectionHeader) -> memoryview:
+        """Return the section contents as a zero-copy view of the mmap."""
+        return memoryview(self._mm)[header.ofs_body:header.ofs_body + header.len_body]
+
+    def iter_symbols(self, header: SectionHeader) -> Iterator[Symbol]:
+        # Pull the linked string table out of the mmap once; the per-symbol
+        # name lookups then run on a plain bytes object.
+        strtab_header = self.section_headers[header.link]
+        strtab = self._mm[strtab_header.ofs_body:strtab_header.ofs_body + strtab_header.len_body]
+        if self._is_64:
+            # st_name, st_info, st_other, st_shndx, st_value, st_size
+            sym_fmt = self._endian + 'IBBHQQ'
+        else:
+            # st_name, st_value, st_size, st_info, st_other, st_shndx
+            sym_fmt = self._endian + 'IIIBBH'
+        assert header.entry_size == struct.calcsize(sym_fmt), f'unexpected symbol entry size {header.entry_size}'
+
+        for entry in struct.iter_unpack(sym_fmt, self._mm[header.ofs_body:header.ofs_body + header.len_body]):
+            if self._is_64:
+                st_name, st_info, _, st_shndx = entry[:4]
+            else:
+                st_name, st_info, st_shndx = entry[0], entry[3], entry[5]
+            name_end = strtab.find(b'\x00', st_name)
+            assert name_end != -1
+            yield Symbol(
+                # Symbol names repeat heavily across ELFs (libc symbols in
+                # particular); interning makes every repeat share one object.
+                name=sys.intern(strtab[st_name:name_end].decode('utf-8')),
+                bind=st_info >> 4,
+                type=st_info & 0xf,
+                sh_idx=st_shndx,
+            )
+
+    def close(self) -> None:
+        self._mm.close()
+        self._f.close()
+
+    def __enter__(self) -> 'ElfFile':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -1,57 +1,148 @@
 #!/usr/bin/env python3
 
-import shutil
+import mmap
+import os
+import tarfile
 from collections import defaultdict
-from pathlib import Path, PurePosixPath
-from tarfile import TarInfo
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
 
 from debian import debfile
 from tqdm import tqdm
 
+# An ELF32 header alone is 52 bytes, so anything smaller cannot be an ELF.
+MIN_ELF_SIZE = 52
+
+# Cheap pre-filters to avoid decompressing the many members (docs, man pages,
+# translations, icons, ...) that are never ELFs. The 4-byte magic check stays
+# the authoritative filter for everything that passes these.
+NON_ELF_DIR_PREFIXES = (
+    './usr/share/doc/',
+    './usr/share/man/',
+    './usr/share/locale/',
+    './usr/share/icons/',
+    './usr/share/help/',
+    './usr/share/info/',
+)
+NON_ELF_SUFFIXES = (
+    '.png', '.svg', '.jpg', '.gif', '.ico',
+    '.mo', '.gz', '.xz', '.zst', '.bz2',
+    '.py', '.pyc', '.sh', '.pl',
+    '.html', '.css', '.txt', '.md', '.xml', '.json', '.yaml', '.conf',
+    '.desktop', '.service', '.ttf', '.otf', '.woff2',
+)
+
 script_dir = Path(__file__).parent.resolve(True)
 packages_dir = script_dir / 'packages'
 
 elfs_out_dir = script_dir / 'extracted-elfs'
-elfs_out_dir.mkdir(exist_ok=True)
 
-num_elfs_written = 0
 
-for deb_path in tqdm(sorted(packages_dir.glob('**/*.deb'))):
-    if not deb_path.is_file():
-        continue
+def open_data_tar(deb: debfile.DebFile) -> tarfile.TarFile:
+    """Open the data.tar member of a .deb for a single forward pass.
+
+    `deb.data.tgz()` opens the tar in random-access mode (`r:*`), where just
+    iterating the members forces a full index pass over the compressed stream.
+    Stream mode (`r|*`) reads each member header lazily, so the archive is
+    decompressed exactly once, front to back. tarfile has no zstd support, so
+    a data.tar.zst falls back to python-debian's own handling.
+    """
+    for ar_member in deb.getmembers():
+        if ar_member.name.startswith('data.tar'):
+            if ar_member.name.endswith('.zst'):
+                break
+            return tarfile.open(fileobj=ar_member, mode='r|*')
+    return deb.data.tgz()
+
+
+def process_deb(deb_path: Path) -> int:
+    num_elfs_written = 0
 
     deb_name = deb_path.name
     rel_deb_path = deb_path.relative_to(packages_dir)
     rel_deb_dir = rel_deb_path.parent
 
-    with debfile.DebFile(deb_path) as deb:
-        with deb.data.tgz() as tar:
-            elf_members_by_name: dict[str, list[TarInfo]] = defaultdict(list)
-            for member in tar.getmembers():
+    # Parse the .deb over an mmap: the ar/tar layers read straight out of the
+    # page cache instead of through a buffered file object, and the fadvise
+    # hint tells the kernel to read ahead aggressively for our single forward
+    # pass.
+    fd = os.open(deb_path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        # The mapping holds its own reference to the file, so the fd can go
+        # right away.
+        mm = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+    finally:
+        os.close(fd)
+
+    with mm, debfile.DebFile(fileobj=mm) as deb:
+        with open_data_tar(deb) as tar:
+            # Read each ELF fully during the detection pass: a second
+            # `tar.extractfile()` later is impossible in stream mode (and
+            # would re-decompress everything up to the member in random-access
+            # mode). Only ELFs are kept in memory, and only for the duration
+            # of one .deb. Since the write loop below works from these
+            # buffers, it performs no tar I/O at all, so its iteration order
+            # doesn't matter for decompression.
+            elf_members_by_name: dict[str, list[tuple[list[str], bytes]]] = defaultdict(list)
+            for member in tar:
                 if not member.isfile():
                     continue
+                if member.size < MIN_ELF_SIZE:
+                    continue
+                if member.name.startswith(NON_ELF_DIR_PREFIXES):
+                    continue
+                if member.name.endswith(NON_ELF_SUFFIXES):
+                    continue
                 with tar.extractfile(member) as extracted_file:
-                    if extracted_file.read(4) != b'\x7fELF':
+                    magic = extracted_file.read(4)
+                    if magic != b'\x7fELF':
                         continue
+                    data = magic + extracted_file.read()
 
-                member_path = PurePosixPath(member.name)
-                elf_members_by_name[member_path.name].append(member)
+                # Split the name once here instead of wrapping it in a
+                # PurePosixPath both for the basename key and again in the
+                # write loop.
+                name_parts = member.name.removeprefix('./').split('/')
+                elf_members_by_name[name_parts[-1]].append((name_parts, data))
 
             for bin_name, elf_members in elf_members_by_name.items():
                 only_basename = len(elf_members) == 1
-                for member in elf_members:
-                    member_path = PurePosixPath(member.name)
-                    name = member_path.name if only_basename else '-'.join(member_path.parts)
+                for name_parts, data in elf_members:
+                    name = name_parts[-1] if only_basename else '-'.join(name_parts)
 
                     source_pkg_dir = elfs_out_dir / rel_deb_dir
-                    source_pkg_dir.mkdir(parents=True, exist_ok=True)
+                    os.makedirs(source_pkg_dir, exist_ok=True)
                     try:
-                        o = open(source_pkg_dir / f'{deb_name}-{name}', 'xb')
+                        # The whole ELF goes out in a single write() straight
+                        # from the buffered member data, so an io-level write
+                        # buffer would only add a memcpy.
+                        o = open(source_pkg_dir / f'{deb_name}-{name}', 'xb', buffering=0)
                     except FileExistsError:
                         continue
 
-                    with tar.extractfile(member) as extracted_file:
-                        shutil.copyfileobj(extracted_file, o)
+                    with o:
+                        o.write(data)
                     num_elfs_written += 1
 
-print(f'{num_elfs_written} ELFs written to {elfs_out_dir}')
+    return num_elfs_written
+
+
+def main() -> None:
+    elfs_out_dir.mkdir(exist_ok=True)
+
+    deb_paths = [deb_path for deb_path in sorted(packages_dir.glob('**/*.deb')) if deb_path.is_file()]
+
+    num_elfs_written = 0
+    # Decompressing each .deb is single-threaded and CPU-bound, but independent
+    # across packages, so spread the debs over all cores.
+    with ProcessPoolExecutor() as executor:
+        futures = [executor.submit(process_deb, deb_path) for deb_path in deb_paths]
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            num_elfs_written += future.result()
+
+    print(f'{num_elfs_written} ELFs written to {elfs_out_dir}')
+
+
+if __name__ == '__main__':
+    main()
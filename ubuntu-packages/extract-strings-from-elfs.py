@@ -1,14 +1,26 @@
 #!/usr/bin/env python3
 
-import json
 import re
-import subprocess
+from bisect import bisect_right
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-from elf import Elf
+import numpy as np
 from tqdm import tqdm
 
+from elf_sections import (
+    SHN_UNDEF,
+    SHT_DYNSYM,
+    SHT_NOBITS,
+    SHT_PROGBITS,
+    STB_GLOBAL,
+    STT_FUNC,
+    STT_OBJECT,
+    ElfFile,
+)
+from utils import write_json_entry
+
 script_dir = Path(__file__).parent.resolve(True)
 elfs_dir = script_dir / 'extracted-elfs'
 out_dir = script_dir / 'extracted-strings'
@@ -20,37 +32,89 @@ RODATA_SECTIONS = ('.rodata', '.rodata.str1.1', '.rodata.str1.4',
                    '.rodata.str1.8', '.rodata.cst4', '.rodata.cst8',
                    '.rodata.cst16', 'rodata')
 
-STRING_SEPARATOR_REGEX = re.compile(r'[\x00-\x08\x0a-\x1f\x7f\ufffd]+')
+# re.ASCII keeps the engine off the Unicode property tables; the class lists
+# explicit codepoints only (including the literal U+FFFD), so the flag cannot
+# change what matches.
+STRING_SEPARATOR_REGEX = re.compile(r'[\x00-\x08\x0a-\x1f\x7f\ufffd]+', re.ASCII)
+
+# A 256-entry lookup table marking the bytes that terminate a C string.
+# Indexing it with the section body classifies every byte in one C-level pass
+# instead of a Python-level loop.
+NULL_BYTE_TABLE = np.zeros(256, dtype=bool)
+NULL_BYTE_TABLE[0x00] = True
+
+# The separator bytes of STRING_SEPARATOR_REGEX other than NUL (runs are
+# already split on NUL). Separator bytes never occur inside a multi-byte UTF-8
+# sequence, so a run without them splits into itself and both the decode of
+# garbage pieces and the split allocations can be skipped. The remaining
+# separator, a literal U+FFFD, is caught after decoding.
+SEPARATOR_BYTE_TABLE = np.zeros(256, dtype=bool)
+SEPARATOR_BYTE_TABLE[0x01:0x09] = True
+SEPARATOR_BYTE_TABLE[0x0a:0x20] = True
+SEPARATOR_BYTE_TABLE[0x7f] = True
+
+def find_null_runs(body: memoryview) -> tuple[np.ndarray, np.ndarray]:
+    """Find maximal NUL-free runs in `body` in one vectorized pass.
+
+    Returns `(runs, sep_counts)`: an array of `(start, end)` offset pairs and
+    a prefix-sum array such that `sep_counts[end] - sep_counts[start]` is the
+    number of (non-NUL) separator bytes in `body[start:end]`.
+    """
+    byte_values = np.frombuffer(body, dtype=np.uint8)
+    mask = NULL_BYTE_TABLE[byte_values]
+    # Find the offsets where the mask flips; the separator sentinels on both
+    # ends make every NUL-free run contribute exactly one (start, end) pair.
+    edges = np.flatnonzero(np.diff(np.concatenate(([True], mask, [True]))))
+    sep_counts = np.concatenate(([0], np.cumsum(SEPARATOR_BYTE_TABLE[byte_values])))
+    return edges.reshape(-1, 2), sep_counts
 
 # https://github.com/armijnhemel/binaryanalysis-ng/blob/e05071e01213c7d7d7261e979ab1d308872e87d0/src/bang/parsers/executable/elf/UnpackParser.py#L88-L90
-# translation table for ASCII strings for the string
-# to pass the isprintable() test
-STRING_TRANSLATION_TABLE = str.maketrans({'\t': ' '})
+# An ASCII string passes the isprintable() test after translating tabs to
+# spaces exactly when it matches this; one fullmatch replaces the separate
+# isascii/tab-translate/isprintable passes per candidate.
+PRINTABLE_ASCII_REGEX = re.compile(r'[\t\x20-\x7e]*', re.ASCII)
 
 STRING_CUTOFF_LENGTH = 4
 
-def extract_strings_from_elf(elf_path: Path) -> dict[str, list[str]]:
-    elf_data = Elf.from_file(elf_path)
-    section_headers: list[Elf.EndianElf.SectionHeader] = elf_data.header.section_headers
-
+def extract_strings_from_elf(elf_data: ElfFile, elf_path: Path) -> dict[str, list[str]]:
     string_literals = []
     defined_functions = []
     undefined_functions = []
     defined_objects = []
     undefined_objects = []
 
-    for header in section_headers:
+    # Local bindings for the per-run loop: LOAD_FAST instead of a module
+    # global / attribute lookup on every candidate string.
+    append_string_literal = string_literals.append
+    split_separators = STRING_SEPARATOR_REGEX.split
+    string_cutoff_length = STRING_CUTOFF_LENGTH
+
+    for header in elf_data.section_headers:
         if header.name in RODATA_SECTIONS:
-            if header.type == Elf.ShType.nobits:
+            if header.type == SHT_NOBITS:
                 continue
-            assert header.type == Elf.ShType.progbits, f'unexpected type {header.type!r} for {header.name!r} section in {elf_path.name}'
-            body: bytes = header.body
+            assert header.type == SHT_PROGBITS, f'unexpected type {header.type!r} for {header.name!r} section in {elf_path.name}'
+            body = elf_data.section_body(header)
 
             # https://github.com/armijnhemel/binaryanalysis-ng/blob/e05071e01213c7d7d7261e979ab1d308872e87d0/src/bang/parsers/executable/elf/UnpackParser.py#L774-L795
-            for s in body.split(b'\x00'):
+            #
+            # The run offsets replace `body.split(b'\x00')`: no bytes object is
+            # allocated for the many short garbage chunks, which can never
+            # yield a string of at least STRING_CUTOFF_LENGTH characters.
+            runs, sep_counts = find_null_runs(body)
+            for start, end in runs:
+                if end - start < string_cutoff_length:
+                    continue
+                s = bytes(body[start:end])
+                has_separators = sep_counts[end] > sep_counts[start]
                 try:
                     decoded_s = s.decode('utf-8')
+                    # A decoded U+FFFD (i.e. a literal b'\xef\xbf\xbd' in the
+                    # section) is a separator too.
+                    if not has_separators and '\ufffd' in decoded_s:
+                        has_separators = True
                 except UnicodeDecodeError:
+                    has_separators = True
                     decoded_s = s.decode('utf-8', errors='replace')
                     # We look for the last UTF-8 decode error, which is indicated by the
                     # U+FFFD REPLACEMENT CHARACTER. If we find it, we only consider the part
@@ -66,45 +130,42 @@ def extract_strings_from_elf(elf_path: Path) -> dict[str, list[str]]:
                     assert repl_ch_idx != -1
                     decoded_s = decoded_s[repl_ch_idx + 1:]
 
-                decoded_strings = STRING_SEPARATOR_REGEX.split(decoded_s)
+                decoded_strings = split_separators(decoded_s) if has_separators else (decoded_s,)
                 for decoded_string in decoded_strings:
-                    if len(decoded_string) < STRING_CUTOFF_LENGTH:
+                    if len(decoded_string) < string_cutoff_length:
                         continue
                     if decoded_string.isspace():
                         continue
 
-                    translated_string = decoded_string.translate(STRING_TRANSLATION_TABLE)
-                    if decoded_string.isascii():
-                        # test the translated string
-                        if translated_string.isprintable():
-                            string_literals.append(decoded_string)
-                        else:
-                            print(f'Skipping non-printable ASCII string {decoded_string!r}')
+                    if PRINTABLE_ASCII_REGEX.fullmatch(decoded_string) or not decoded_string.isascii():
+                        append_string_literal(decoded_string)
                     else:
-                        string_literals.append(decoded_string)
-        elif header.type == Elf.ShType.dynsym:
+                        print(f'Skipping non-printable ASCII string {decoded_string!r}')
+
+            # Release the view so closing the mmap can't fail with
+            # exported buffers still alive.
+            body.release()
+        elif header.type == SHT_DYNSYM:
             assert header.name == '.dynsym'
-            entries: list[Elf.EndianElf.DynsymSectionEntry] = header.body.entries
 
             # https://github.com/armijnhemel/binaryanalysis-ng/blob/e05071e01213c7d7d7261e979ab1d308872e87d0/src/bang/parsers/executable/elf/UnpackParser.py#L676-L687
-            for entry in entries:
-                if entry.bind != Elf.SymbolBinding.global_symbol:
+            #
+            # Index the output list arithmetically instead of through the
+            # nested type/definedness if-chain per entry.
+            symbol_buckets = (
+                defined_functions, undefined_functions,
+                defined_objects, undefined_objects,
+            )
+            for entry in elf_data.iter_symbols(header):
+                if entry.bind != STB_GLOBAL:
                     # print(f'Skipping symbol {entry.name!r} because it has binding {entry.bind!r}')
                     continue
 
-                symbol_name = entry.name
-                assert symbol_name is not None
-
-                if entry.type == Elf.SymbolType.func:
-                    if entry.sh_idx_special == Elf.SectionHeaderIdxSpecial.undefined:
-                        undefined_functions.append(symbol_name)
-                    else:
-                        defined_functions.append(symbol_name)
-                elif entry.type == Elf.SymbolType.object:
-                    if entry.sh_idx_special == Elf.SectionHeaderIdxSpecial.undefined:
-                        undefined_objects.append(symbol_name)
-                    else:
-                        defined_objects.append(symbol_name)
+                symbol_type = entry.type
+                if symbol_type != STT_FUNC and symbol_type != STT_OBJECT:
+                    continue
+                bucket_idx = ((symbol_type == STT_OBJECT) << 1) | (entry.sh_idx == SHN_UNDEF)
+                symbol_buckets[bucket_idx].append(entry.name)
 
     return {
         'strings': string_literals,
@@ -114,67 +175,87 @@ def extract_strings_from_elf(elf_path: Path) -> dict[str, list[str]]:
         'undefined_objects': undefined_objects,
     }
 
-def extract_strings_from_blob(elf_path: Path) -> dict[str, list[str]]:
-    fixed_strings_args = 'strings -a -t x --'.split()
-    strings_out = subprocess.check_output(fixed_strings_args + [elf_path], encoding='utf-8')
-
-    elf_data = Elf.from_file(elf_path)
-    section_headers: list[Elf.EndianElf.SectionHeader] = elf_data.header.section_headers
-    section_ranges: list[tuple[str, range]] = []
-    for section_header in section_headers:
-        if section_header.type == Elf.ShType.nobits:
-            continue
-        section_range = range(
-            section_header.ofs_body, section_header.ofs_body + section_header.len_body
-        )
-        # See <https://refspecs.linuxbase.org/elf/gabi4+/ch4.sheader.html>:
-        #
-        # > Sections in a file may not overlap. No byte in a file resides in
-        # > more than one section.
-        #
-        # Let's make sure this is true.
-        assert all(
-            (
-                other_section_range.stop <= section_range.start
-                or section_range.stop <= other_section_range.start
-            )
-            for _, other_section_range in section_ranges
-        ), f'{elf_path}: unexpected overlapping section {section_header.name!r}'
-        section_ranges.append((section_header.name or '', section_range))
+# Number of ELFs to process per worker task: large enough to amortize the
+# task-dispatch IPC, small enough to keep the pool busy evenly.
+STRINGS_BATCH_SIZE = 32
+
+# In-process equivalent of `strings -a` with its default settings: maximal
+# runs of at least 4 printable 7-bit characters (isgraph() or isblank(), i.e.
+# tab and 0x20-0x7e). Scanning the mmap with one C-level regex pass replaces
+# the fork+exec of a `strings` process per batch, its full re-read of every
+# file and the text round-trip through its stdout.
+STRINGS_TOKEN_REGEX = re.compile(rb'[\t\x20-\x7e]{4,}')
+
+def extract_strings_from_blob(elf_data: ElfFile, elf_path: Path) -> dict[str, list[str]]:
+    sections = sorted(
+        (section_header.ofs_body, section_header.ofs_body + section_header.len_body, section_header.name or '')
+        for section_header in elf_data.section_headers
+        if section_header.type != SHT_NOBITS
+    )
+    # See <https://refspecs.linuxbase.org/elf/gabi4+/ch4.sheader.html>:
+    #
+    # > Sections in a file may not overlap. No byte in a file resides in
+    # > more than one section.
+    #
+    # Let's make sure this is true; for the sorted list a single pass over
+    # neighbours suffices.
+    assert all(
+        sections[i - 1][1] <= sections[i][0] for i in range(1, len(sections))
+    ), f'{elf_path}: unexpected overlapping sections'
+    starts = [start for start, _, _ in sections]
 
     res_strings = defaultdict(list)
 
-    for line in strings_out.splitlines():
-        line = line.lstrip(' ')
-        hex_offset, s = line.split(' ', maxsplit=1)
-        offset = int(hex_offset, 16)
-        section_name = next(
-            (
-                section_name
-                for section_name, section_range in section_ranges
-                if offset in section_range
-            ),
-            '',
-        )
+    for m in STRINGS_TOKEN_REGEX.finditer(elf_data.raw):
+        offset = m.start()
+        s = m.group().decode('ascii')
+        # Sections don't overlap, so the only candidate is the last one
+        # starting at or before the offset - found by bisection instead of a
+        # linear scan over all sections per string.
+        i = bisect_right(starts, offset) - 1
+        section_name = sections[i][2] if i >= 0 and offset < sections[i][1] else ''
         res_strings[section_name].append(s)
 
     return res_strings
 
+def process_elf_batch(elf_paths: list[Path]) -> list[tuple[str, dict[str, list[str]], dict[str, list[str]]]]:
+    results = []
+    for elf_path in elf_paths:
+        # One parse of the section header table serves both extractors.
+        with ElfFile(elf_path) as elf_data:
+            results.append((
+                str(elf_path.relative_to(elfs_dir)),
+                extract_strings_from_elf(elf_data, elf_path),
+                extract_strings_from_blob(elf_data, elf_path),
+            ))
+    return results
+
 def main() -> None:
-    json_from_elfs = {}
-    json_from_blobs = {}
     elfs = [path for path in elfs_dir.glob('**/*') if path.is_file()]
     elfs.sort()
-    for elf_path in tqdm(elfs):
-        rel_elf_path = str(elf_path.relative_to(elfs_dir))
-        json_from_elfs[rel_elf_path] = extract_strings_from_elf(elf_path)
-        json_from_blobs[rel_elf_path] = extract_strings_from_blob(elf_path)
-
-    with open(out_dir / 'from-elfs.json', 'w', encoding='utf-8') as f:
-        json.dump(json_from_elfs, f, ensure_ascii=False, allow_nan=False, indent=2)
-
-    with open(out_dir / 'from-blobs.json', 'w', encoding='utf-8') as f:
-        json.dump(json_from_blobs, f, ensure_ascii=False, allow_nan=False, indent=2)
+    batches = [elfs[i:i + STRINGS_BATCH_SIZE] for i in range(0, len(elfs), STRINGS_BATCH_SIZE)]
+    # The per-ELF work (ELF parsing + string scanning) is CPU-bound and
+    # independent across files, so spread the ELFs over all cores. `map`
+    # preserves the sorted input order in the output JSON. Each result is
+    # streamed straight to the output files, so peak memory stays at one
+    # batch of results instead of the strings of every ELF at once.
+    with (
+        ProcessPoolExecutor() as executor,
+        open(out_dir / 'from-elfs.json', 'w', encoding='utf-8') as f_elfs,
+        open(out_dir / 'from-blobs.json', 'w', encoding='utf-8') as f_blobs,
+    ):
+        f_elfs.write('{')
+        f_blobs.write('{')
+        first = True
+        for batch_results in tqdm(
+            executor.map(process_elf_batch, batches), total=len(batches)
+        ):
+            for rel_elf_path, from_elf, from_blob in batch_results:
+                write_json_entry(f_elfs, rel_elf_path, from_elf, first)
+                write_json_entry(f_blobs, rel_elf_path, from_blob, first)
+                first = False
+        f_elfs.write('}' if first else '\n}')
+        f_blobs.write('}' if first else '\n}')
 
 if __name__ == '__main__':
     main()
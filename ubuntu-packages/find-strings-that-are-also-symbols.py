@@ -2,32 +2,64 @@
 
 import itertools
 import json
+import sys
 from collections import defaultdict
 from pathlib import Path
 
-from utils import NoIndent, NoIndentEncoder
+import orjson
 
 script_dir = Path(__file__).parent.resolve(True)
 strings_dir = script_dir / 'extracted-strings'
 
 
+def one_line_fragment(value) -> orjson.Fragment:
+    # Pre-serialized with stdlib json: orjson would not keep the item/key
+    # separators of the surrounding indented dump on the embedded line.
+    return orjson.Fragment(json.dumps(value, ensure_ascii=False, allow_nan=False))
+
+
 def should_include_locations_dict(locations_dict: dict[str, list[str]]):
     feature_types = set(itertools.chain.from_iterable(locations_dict.values()))
     return len(feature_types) > 1 and 'strings' in feature_types
 
 
 def main():
-    with open(strings_dir / 'from-elfs.json', 'r', encoding='utf-8') as f:
-        json_from_elfs: dict[str, dict] = json.load(f)
-
-    inst_to_locations: dict[str, dict[str, list[str]]] = defaultdict(lambda: defaultdict(list))
+    # orjson parses the big input several times faster than stdlib json and
+    # works on the raw UTF-8 bytes directly.
+    with open(strings_dir / 'from-elfs.json', 'rb') as f:
+        json_from_elfs: dict[str, dict] = orjson.loads(f.read())
+
+    # Intern the instances: the same symbol/string typically occurs in many
+    # ELFs, so inst_to_locations keys become shared str objects and their
+    # hashing hits the identity fast path.
+    for features_dict in json_from_elfs.values():
+        for instances in features_dict.values():
+            instances[:] = map(sys.intern, instances)
+
+    # Create all the per-instance dicts in one pre-pass (duplicate keys keep
+    # their first-insertion order, so iteration order matches what the lazy
+    # defaultdict construction produced). The hot loop below then never hits
+    # a defaultdict factory, just plain lookups.
+    inst_to_locations: dict[str, dict[str, dict[str, None]]] = {
+        inst: {}
+        for features_dict in json_from_elfs.values()
+        for instances in features_dict.values()
+        for inst in instances
+    }
 
     for elf_path, features_dict in json_from_elfs.items():
         for feature_type, instances in features_dict.items():
             for inst in instances:
-                pool = inst_to_locations[inst][elf_path]
-                if feature_type not in pool:
-                    pool.append(feature_type)
+                # The inner dict is used as an insertion-ordered set of
+                # feature types: assigning a key is O(1) where a `not in`
+                # test on a list would be O(k), and unlike a real set it
+                # keeps the original order for the output.
+                locations_dict = inst_to_locations[inst]
+                feature_types_dict = locations_dict.get(elf_path)
+                if feature_types_dict is None:
+                    locations_dict[elf_path] = {feature_type: None}
+                else:
+                    feature_types_dict[feature_type] = None
 
     filtered_inst_to_locations = {
         inst: locations_dict
@@ -45,28 +77,30 @@ def main():
         ])
         instances_by_locations_dict[locations_dict_as_key].append(inst)
 
+    sorted_items = sorted(instances_by_locations_dict.items(), key=lambda t: sum(len(elfs) for _, elfs in t[0]))
+
     instances_by_locations_dict_as_list = [
         {
             'instances': instances,
             'locations': [
-                {'feature_types': NoIndent(feature_types), 'elfs': elfs}
+                {'feature_types': one_line_fragment(feature_types), 'elfs': elfs}
                 for feature_types, elfs in locations_dict_as_key
             ],
         }
-        for locations_dict_as_key, instances in sorted(instances_by_locations_dict.items(), key=lambda t: sum(len(elfs) for _, elfs in t[0]))
+        for locations_dict_as_key, instances in sorted_items
     ]
 
     instances_by_locations_dict_only_isolated_strings_as_list = [
         entry
-        for entry in instances_by_locations_dict_as_list
-        if any(loc['feature_types'].value == ('strings',) for loc in entry['locations'])
+        for (locations_dict_as_key, _), entry in zip(sorted_items, instances_by_locations_dict_as_list)
+        if any(feature_types == ('strings',) for feature_types, _ in locations_dict_as_key)
     ]
 
-    with open(strings_dir / 'from-elfs-strings-matching-symbols.json', 'w', encoding='utf-8') as f:
-        json.dump(instances_by_locations_dict_as_list, f, ensure_ascii=False, allow_nan=False, indent=2, cls=NoIndentEncoder)
+    with open(strings_dir / 'from-elfs-strings-matching-symbols.json', 'wb') as f:
+        f.write(orjson.dumps(instances_by_locations_dict_as_list, option=orjson.OPT_INDENT_2))
 
-    with open(strings_dir / 'from-elfs-isolated-strings-matching-symbols.json', 'w', encoding='utf-8') as f:
-        json.dump(instances_by_locations_dict_only_isolated_strings_as_list, f, ensure_ascii=False, allow_nan=False, indent=2, cls=NoIndentEncoder)
+    with open(strings_dir / 'from-elfs-isolated-strings-matching-symbols.json', 'wb') as f:
+        f.write(orjson.dumps(instances_by_locations_dict_only_isolated_strings_as_list, option=orjson.OPT_INDENT_2))
 
 
 if __name__ == '__main__':
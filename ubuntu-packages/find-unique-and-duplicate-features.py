@@ -1,53 +1,152 @@
 #!/usr/bin/env python3
 
-import copy
 import itertools
 import json
-import re
 import sys
+from array import array
 from collections import Counter, defaultdict, namedtuple
-from collections.abc import Collection
-from dataclasses import dataclass
 from operator import itemgetter
 from pathlib import Path
 
-from utils import NoIndent, NoIndentEncoder
+import numpy as np
+import orjson
 
-ELF_PATH_REGEX = re.compile(r'(.*)/(.*_amd64\.deb)-(.*)')
+ORJSON_OPTS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+
+def one_line_fragment(value) -> orjson.Fragment:
+    """Pre-serialize `value` onto one line for embedding in an indented dump.
+
+    Replaces the NoIndent/NoIndentEncoder placeholder machinery: orjson
+    inlines the fragment verbatim with no post-processing pass over the
+    output. The inner dump stays on stdlib json, whose `', '`/`': '` item
+    separators match what NoIndentEncoder emitted.
+    """
+    return orjson.Fragment(json.dumps(value, ensure_ascii=False, allow_nan=False))
+
+def write_indented_entry(f, key, value, first: bool) -> None:
+    """Append one `"key": value` entry of a streamed indent=2 JSON object.
+
+    Emits the same bytes as `orjson.dumps` of the whole dict with
+    `OPT_INDENT_2`, but entry by entry, so peak memory stays at one encoded
+    entry instead of the whole output buffer. The opening brace comes from
+    the first entry, so close the object with
+    `f.write(b'{}' if first else b'\\n}')`.
+    """
+    f.write(b'{\n' if first else b',\n')
+    f.write(b'  ')
+    f.write(orjson.dumps(key if isinstance(key, str) else str(key)))
+    f.write(b': ')
+    # Shift the nested value one indent level deeper. Newlines inside JSON
+    # strings are escaped, so every raw b'\n' in the chunk is formatting.
+    f.write(orjson.dumps(value, option=ORJSON_OPTS).replace(b'\n', b'\n  '))
+
+def write_indented_element(f, value, first: bool) -> None:
+    """Like `write_indented_entry`, for one element of a top-level JSON list.
+
+    Close the list with `f.write(b'[]' if first else b'\\n]')`.
+    """
+    f.write(b'[\n' if first else b',\n')
+    f.write(b'  ')
+    f.write(orjson.dumps(value, option=ORJSON_OPTS).replace(b'\n', b'\n  '))
+
+# Consecutive small IDs for package names, assigned at parse time. The origin
+# counting builds a set per feature instance; sets of ints hash and compare
+# cheaper than sets of package-name strings.
+_PKG_IDS: dict[str, int] = {}
+
+def _pkg_id(pkg: str) -> int:
+    return _PKG_IDS.setdefault(pkg, len(_PKG_IDS))
 
-@dataclass(frozen=True)
 class ElfPath:
-    source_pkg: str
-    binary_pkg: str
-    name: str
+    """One extracted ELF, identified by (source_pkg, binary_pkg, name).
+
+    A hand-rolled `__slots__` class instead of a frozen dataclass: ElfPaths
+    are dict keys and set elements in the hot loops, and the generated
+    dataclass `__hash__` allocates a field tuple per call. The hash and the
+    str form are computed once in `__init__` instead.
+    """
+
+    __slots__ = ('source_pkg', 'binary_pkg', 'name', 'source_pkg_id', 'binary_pkg_id', '_hash', '_str')
+
+    def __init__(self, source_pkg: str, binary_pkg: str, name: str):
+        self.source_pkg = source_pkg
+        self.binary_pkg = binary_pkg
+        self.name = name
+        # The IDs are derived from the package names, so they stay out of
+        # __eq__/__hash__.
+        self.source_pkg_id = _pkg_id(source_pkg)
+        self.binary_pkg_id = _pkg_id(binary_pkg)
+        self._hash = hash((source_pkg, binary_pkg, name))
+        self._str = f'{source_pkg}/{binary_pkg}-{name}'
 
     @staticmethod
     def from_str(s: str) -> 'ElfPath':
-        match = ELF_PATH_REGEX.fullmatch(s)
-        source_pkg, binary_pkg, name = match.groups()
+        # Split on the known separators directly instead of running a regex
+        # (`(.*)/(.*_amd64\.deb)-(.*)`) per path; rpartition keeps the greedy
+        # "last occurrence" semantics of the regex.
+        pkg_prefix, sep, name = s.rpartition('_amd64.deb-')
+        assert sep, f'unexpected ELF path {s!r}'
+        source_pkg, _, binary_pkg_stem = pkg_prefix.rpartition('/')
+        binary_pkg = binary_pkg_stem + '_amd64.deb'
         return ElfPath(source_pkg, binary_pkg, name)
 
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __eq__(self, other) -> bool:
+        return (
+            self._hash == other._hash
+            and self.source_pkg == other.source_pkg
+            and self.binary_pkg == other.binary_pkg
+            and self.name == other.name
+        )
+
     def __str__(self) -> str:
-        return f'{self.source_pkg}/{self.binary_pkg}-{self.name}'
+        return self._str
 
 def read_from_elfs_json(json_path: Path) -> dict[ElfPath, dict[str, list[str]]]:
-    with open(json_path, 'r', encoding='utf-8') as f:
-        orig_json = json.load(f)
+    # orjson parses the big input several times faster than stdlib json and
+    # works on the raw UTF-8 bytes directly.
+    with open(json_path, 'rb') as f:
+        orig_json = orjson.loads(f.read())
+        # Intern the instances: the same symbol/string typically occurs in
+        # many ELFs, and interning makes inst_to_locations and the dedup sets
+        # store (and hash) one shared str object per distinct value.
+        for features_dict in orig_json.values():
+            for instances in features_dict.values():
+                instances[:] = map(sys.intern, instances)
         return {ElfPath.from_str(elf_path_str): features_dict for elf_path_str, features_dict in orig_json.items()}
 
 NumOrigins = namedtuple('NumOrigins', ('num_source_pkgs', 'num_binary_pkgs', 'num_elfs'))
 
 JSON_COMMENT = f"The meaning of the numbers is [{', '.join(NumOrigins._fields)}]"
 
-def get_num_origins(elf_paths: Collection[ElfPath]) -> NumOrigins:
-    num_elfs = len(elf_paths)
-    num_binary_pkgs = len(set(elf_path.binary_pkg for elf_path in elf_paths))
-    num_source_pkgs = len(set(elf_path.source_pkg for elf_path in elf_paths))
+def get_num_origins(elf_ids: array, binary_of: np.ndarray, source_of: np.ndarray) -> NumOrigins:
+    ids = np.frombuffer(elf_ids, dtype=np.int32)
     return NumOrigins(
-        num_elfs=num_elfs,
-        num_binary_pkgs=num_binary_pkgs,
-        num_source_pkgs=num_source_pkgs,
+        num_elfs=len(ids),
+        num_binary_pkgs=len(np.unique(binary_of[ids])),
+        num_source_pkgs=len(np.unique(source_of[ids])),
+    )
+
+def count_distinct_per_group(group_ids: np.ndarray, values: np.ndarray, num_groups: int) -> np.ndarray:
+    """Count the distinct values within each group in one vectorized pass.
+
+    `group_ids` must be sorted (which `np.repeat` of a range produces); a
+    lexsort then orders the values within each group, so every distinct value
+    shows up as exactly one position where the (group, value) pair changes.
+    """
+    if len(group_ids) == 0:
+        return np.zeros(num_groups, dtype=np.int64)
+    order = np.lexsort((values, group_ids))
+    sorted_group_ids = group_ids[order]
+    sorted_values = values[order]
+    is_first_of_run = np.empty(len(order), dtype=bool)
+    is_first_of_run[0] = True
+    is_first_of_run[1:] = (
+        (sorted_group_ids[1:] != sorted_group_ids[:-1]) | (sorted_values[1:] != sorted_values[:-1])
     )
+    return np.bincount(sorted_group_ids[is_first_of_run], minlength=num_groups)
 
 def get_uniq_class(num_origins: NumOrigins) -> str:
     if num_origins.num_elfs == 1:
@@ -85,27 +184,40 @@ def generate_dumps(json_path: Path, output_dir: Path, global_uniqueness: bool) -
 
     elf_to_features = read_from_elfs_json(json_path)
 
-    elfs_having_feature_type: dict[str, list[ElfPath]] = defaultdict(list)
-    inst_to_locations: dict[str, dict[str, list[ElfPath]]] = defaultdict(dict)
-    for elf_path, features_dict in elf_to_features.items():
+    # ELFs are referred to by their index into elf_list from here on: the
+    # location lists become compact arrays of 4-byte ints instead of lists of
+    # object pointers, and the id -> package-id maps turn the origin counting
+    # into plain vectorized indexing.
+    elf_list = list(elf_to_features)
+    binary_of = np.fromiter((elf_path.binary_pkg_id for elf_path in elf_list), np.int64, count=len(elf_list))
+    source_of = np.fromiter((elf_path.source_pkg_id for elf_path in elf_list), np.int64, count=len(elf_list))
+
+    elfs_having_feature_type: dict[str, array] = defaultdict(lambda: array('i'))
+    inst_to_locations: dict[str, dict[str, array]] = defaultdict(dict)
+    num_unique_feature_type_instances = Counter()
+    for elf_id, features_dict in enumerate(elf_to_features.values()):
         for feature_type, instances in features_dict.items():
             if instances:
-                elfs_having_feature_type[feature_type].append(elf_path)
-            for inst in instances:
+                elfs_having_feature_type[feature_type].append(elf_id)
+            # `dict.fromkeys` dedups the instances of this ELF in one C-level
+            # pass, replacing the per-occurrence "already appended this ELF?"
+            # check on the locations list.
+            for inst in dict.fromkeys(instances):
+                # One lookup on the inner dict per append (get + append or
+                # insert) instead of a `in` test followed by `[]`.
                 locations_dict = inst_to_locations[inst]
-                if feature_type not in locations_dict:
-                    locations_dict[feature_type] = []
-                elif locations_dict[feature_type][-1] == elf_path:
-                    continue
-                locations_dict[feature_type].append(elf_path)
-
-    num_unique_feature_type_instances = Counter()
-    for inst, locations_dict in inst_to_locations.items():
-        for feature_type in locations_dict:
-            num_unique_feature_type_instances[feature_type] += 1
+                elfs = locations_dict.get(feature_type)
+                if elfs is None:
+                    locations_dict[feature_type] = array('i', (elf_id,))
+                    # A (feature_type, instance) pair shows up here exactly
+                    # once, so counting it now saves the re-iteration of
+                    # inst_to_locations just for these totals.
+                    num_unique_feature_type_instances[feature_type] += 1
+                else:
+                    elfs.append(elf_id)
 
     num_feature_type_origins_and_counts = {
-        feature_type: {'count': num_unique_feature_type_instances[feature_type], 'origins': get_num_origins(elfs)}
+        feature_type: {'count': num_unique_feature_type_instances[feature_type], 'origins': get_num_origins(elfs, binary_of, source_of)}
         for feature_type, elfs in elfs_having_feature_type.items()
     }
     sorted_feature_types = [
@@ -129,57 +241,106 @@ def generate_dumps(json_path: Path, output_dir: Path, global_uniqueness: bool) -
         if num_feature_type_origins_and_counts[feature_type]['origins'].num_source_pkgs < 5
     ]
 
-    with open(output_dir / 'feature-types-aggregated-counts.json', 'w', encoding='utf-8') as f:
+    with open(output_dir / 'feature-types-aggregated-counts.json', 'wb') as f:
         json_body = {
             '$comment': f"The meaning of the numbers in 'origins' is [{', '.join(NumOrigins._fields)}]",
             'data': {
-                feature_type: NoIndent(num_feature_type_origins_and_counts[feature_type])
+                feature_type: one_line_fragment(num_feature_type_origins_and_counts[feature_type])
                 for feature_type in sorted_feature_types
             }
         }
-        json.dump(json_body, f, ensure_ascii=False, allow_nan=False, indent=2, cls=NoIndentEncoder)
+        f.write(orjson.dumps(json_body, option=ORJSON_OPTS))
 
     grouped_by_elf_set = defaultdict(lambda: defaultdict(list))
 
     UNIQ_CLASSES = ['elf_unique', 'binary_pkg_unique', 'source_pkg_unique', 'not_unique']
-    uniq_classes_dict_template = {uniq_class: [] for uniq_class in UNIQ_CLASSES}
 
-    elf_to_features_classified = {
-        str(elf_path): {
-            feature_type: copy.deepcopy(uniq_classes_dict_template)
-            for feature_type in features_dict
-        }
-        for elf_path, features_dict in elf_to_features.items()
-    }
-    aggr_features = {
-        feature_type: copy.deepcopy(uniq_classes_dict_template)
+    # Build the nested {uniq_class: []} dicts directly: a comprehension
+    # allocates them an order of magnitude faster than copy.deepcopy of a
+    # template, which goes through the generic reflection/memo machinery.
+    # Indexed by elf_id while classifying; the ELF paths are stringified once
+    # per ELF just before dumping, instead of re-formatting str(elf_path) for
+    # every (instance, feature_type, ELF) append in the loop below. Stored
+    # sparsely: only the (feature_type, uniq_class) buckets that actually
+    # receive an append get created, and the mostly-empty full template is
+    # materialized one ELF at a time while streaming the dump.
+    elfs_classified: list[dict[str, dict[str, list[str]]]] = [{} for _ in elf_list]
+    # Structure-of-arrays buckets: the instances and the indices of their
+    # groups in parallel, instead of one (inst, NumOrigins) tuple per entry.
+    # The origin counts live in the per-group arrays above, so nothing per
+    # entry has to be allocated; the NumOrigins are materialized only for the
+    # entries actually emitted into classified-aggregated.json.
+    aggr_features: dict[str, dict[str, tuple[list[str], array]]] = {
+        feature_type: {uniq_class: ([], array('i')) for uniq_class in UNIQ_CLASSES}
         for feature_type in sorted_feature_types
     }
-    aggr_by_num_origins_counts = {key: defaultdict(Counter) for key in ('elfs', 'binary_pkgs', 'source_pkgs')}
 
-    for inst, locations_dict in inst_to_locations.items():
+    # Precompute the origin counts of every (instance, feature_type) group in
+    # a few vectorized passes over flat arrays, instead of building two dedup
+    # sets per group in the loop below. `groups` lists the groups in the
+    # loop's iteration order, so indexing by a running counter lines up.
+    groups = [elfs for locations_dict in inst_to_locations.values() for elfs in locations_dict.values()]
+    group_ids = np.repeat(np.arange(len(groups)), [len(elfs) for elfs in groups])
+    pair_elf_ids = (
+        np.concatenate([np.frombuffer(elfs, dtype=np.int32) for elfs in groups])
+        if groups else np.empty(0, dtype=np.int32)
+    )
+    binary_ids = binary_of[pair_elf_ids]
+    source_ids = source_of[pair_elf_ids]
+    num_elfs_per_group = np.fromiter((len(elfs) for elfs in groups), np.int64, count=len(groups))
+    num_binary_pkgs_per_group = count_distinct_per_group(group_ids, binary_ids, len(groups))
+    num_source_pkgs_per_group = count_distinct_per_group(group_ids, source_ids, len(groups))
+
+    if global_uniqueness:
+        # Same idea one level up: per instance, over the concatenation of all
+        # its feature types' ELF lists (the distinct counts of a multiset are
+        # the distinct counts of its underlying set, so no union needed).
+        inst_ids = np.repeat(
+            np.arange(len(inst_to_locations)),
+            [sum(len(elfs) for elfs in locations_dict.values()) for locations_dict in inst_to_locations.values()],
+        )
+        num_elfs_per_inst = count_distinct_per_group(inst_ids, pair_elf_ids, len(inst_to_locations))
+        num_binary_pkgs_per_inst = count_distinct_per_group(inst_ids, binary_ids, len(inst_to_locations))
+        num_source_pkgs_per_inst = count_distinct_per_group(inst_ids, source_ids, len(inst_to_locations))
+
+    group_idx = 0
+    for inst_idx, (inst, locations_dict) in enumerate(inst_to_locations.items()):
         if global_uniqueness:
-            all_elfs_with_inst = set(itertools.chain.from_iterable(locations_dict.values()))
-            num_origins = get_num_origins(all_elfs_with_inst)
-            uniq_class = get_uniq_class(num_origins)
+            uniq_class = get_uniq_class(NumOrigins(
+                num_elfs=int(num_elfs_per_inst[inst_idx]),
+                num_binary_pkgs=int(num_binary_pkgs_per_inst[inst_idx]),
+                num_source_pkgs=int(num_source_pkgs_per_inst[inst_idx]),
+            ))
 
         for feature_type, elfs in locations_dict.items():
-            local_num_origins = get_num_origins(elfs)
-            local_uniq_class = get_uniq_class(local_num_origins)
+            group = group_idx
+            group_idx += 1
             if not global_uniqueness:
-                num_origins = local_num_origins
-                uniq_class = local_uniq_class
+                uniq_class = get_uniq_class(NumOrigins(
+                    num_elfs=len(elfs),
+                    num_binary_pkgs=int(num_binary_pkgs_per_group[group]),
+                    num_source_pkgs=int(num_source_pkgs_per_group[group]),
+                ))
 
             if uniq_class == 'not_unique':
-                grouped_by_elf_set[tuple(elfs)][feature_type].append(inst)
-
-            aggr_features[feature_type][uniq_class].append((inst, local_num_origins))
-            aggr_by_num_origins_counts['elfs'][feature_type][num_origins.num_elfs] += 1
-            aggr_by_num_origins_counts['binary_pkgs'][feature_type][num_origins.num_binary_pkgs] += 1
-            aggr_by_num_origins_counts['source_pkgs'][feature_type][num_origins.num_source_pkgs] += 1
-
-            for elf_path in elfs:
-                elf_to_features_classified[str(elf_path)][feature_type][uniq_class].append(inst)
+                # Key by the raw id bytes: hashing one bytes object is a
+                # single C-level pass over the buffer, where a tuple key
+                # hashes every element int individually.
+                grouped_by_elf_set[elfs.tobytes()][feature_type].append(inst)
+
+            bucket_insts, bucket_groups = aggr_features[feature_type][uniq_class]
+            bucket_insts.append(inst)
+            bucket_groups.append(group)
+
+            for elf_id in elfs:
+                features_classified = elfs_classified[elf_id]
+                buckets = features_classified.get(feature_type)
+                if buckets is None:
+                    features_classified[feature_type] = {uniq_class: [inst]}
+                elif uniq_class in buckets:
+                    buckets[uniq_class].append(inst)
+                else:
+                    buckets[uniq_class] = [inst]
 
     if 'strings' in aggr_features:
         aggr_strings_iter = aggr_features['strings'].items()
@@ -188,58 +349,160 @@ def generate_dumps(json_path: Path, output_dir: Path, global_uniqueness: bool) -
         # everything as a string.
         aggr_strings_iter = itertools.chain.from_iterable(d.items() for d in aggr_features.values())
 
-    aggr_strings_by_len = defaultdict(lambda: copy.deepcopy(uniq_classes_dict_template))
-    for uniq_class, strings_list in aggr_strings_iter:
-        for s, _ in strings_list:
-            aggr_strings_by_len[len(s)][uniq_class].append(s)
-
-    ordered_aggr_strings_by_len = {
-        len_s: strings_dict
-        for len_s, strings_dict in sorted(aggr_strings_by_len.items(), key=itemgetter(0))
-    }
+    # One C-level sort by length plus a linear groupby scan replaces the
+    # per-string defaultdict lookup and the separate re-sort of the buckets.
+    # The sort is stable, so strings keep their encounter order within each
+    # (length, uniq_class) bucket.
+    strings_with_len = sorted(
+        ((len(s), uniq_class, s) for uniq_class, (strings_list, _) in aggr_strings_iter for s in strings_list),
+        key=itemgetter(0),
+    )
+    ordered_aggr_strings_by_len = {}
+    for len_s, group in itertools.groupby(strings_with_len, key=itemgetter(0)):
+        strings_dict = {uniq_class: [] for uniq_class in UNIQ_CLASSES}
+        for _, uniq_class, s in group:
+            strings_dict[uniq_class].append(s)
+        ordered_aggr_strings_by_len[len_s] = strings_dict
     ordered_aggr_strings_by_len_counts = {
-        len_s: NoIndent({uniq_class: len(strings_list) for uniq_class, strings_list in strings_dict.items()})
+        len_s: one_line_fragment({uniq_class: len(strings_list) for uniq_class, strings_list in strings_dict.items()})
         for len_s, strings_dict in ordered_aggr_strings_by_len.items()
     }
 
-    ordered_aggr_features = {
-        feature_type: {
-            uniq_class: {tup[0]: NoIndent(tup[1]) for tup in sorted(instances, key=itemgetter(1), reverse=True)}
-            for uniq_class, instances in features_dict.items()
-        }
-        for feature_type, features_dict in aggr_features.items()
-    }
+    # Order the instances of every (feature_type, uniq_class) bucket by their
+    # NumOrigins, descending, in one vectorized pass instead of a Python-level
+    # `sorted(..., key=itemgetter(1), reverse=True)` per bucket. The three
+    # counts pack into one int64 that compares like the tuple (20 bits each is
+    # plenty of headroom: ~1M ELFs); lexsort is stable, so ties keep their
+    # encounter order exactly like the stable reverse sort did.
+    buckets_in_order = [
+        bucket
+        for features_dict in aggr_features.values()
+        for bucket in features_dict.values()
+    ]
+    flat_insts = [inst for insts, _ in buckets_in_order for inst in insts]
+    bucket_ids = np.repeat(np.arange(len(buckets_in_order)), [len(insts) for insts, _ in buckets_in_order])
+    flat_groups = (
+        np.concatenate([np.frombuffer(bucket_groups, dtype=np.int32) for _, bucket_groups in buckets_in_order])
+        if buckets_in_order else np.empty(0, dtype=np.int32)
+    )
+    sort_keys = (
+        (num_source_pkgs_per_group[flat_groups] << 40)
+        | (num_binary_pkgs_per_group[flat_groups] << 20)
+        | num_elfs_per_group[flat_groups]
+    )
+    instance_order = np.lexsort((-sort_keys, bucket_ids))
+
+    ordered_aggr_features = {}
+    bucket_start = 0
+    for feature_type, features_dict in aggr_features.items():
+        ordered_features_dict = {}
+        for uniq_class, (insts, _) in features_dict.items():
+            bucket_order = instance_order[bucket_start:bucket_start + len(insts)]
+            bucket_start += len(insts)
+            ordered_features_dict[uniq_class] = {
+                flat_insts[i]: one_line_fragment(NumOrigins(
+                    num_source_pkgs=int(num_source_pkgs_per_group[flat_groups[i]]),
+                    num_binary_pkgs=int(num_binary_pkgs_per_group[flat_groups[i]]),
+                    num_elfs=int(num_elfs_per_group[flat_groups[i]]),
+                ))
+                for i in bucket_order
+            }
+        ordered_aggr_features[feature_type] = ordered_features_dict
 
     ordered_grouped_by_elf_set = [
-        {'elfs': list(map(str, elf_paths)), **features_dict}
-        for elf_paths, features_dict in sorted(grouped_by_elf_set.items(), key=lambda t: sum(len(instances) for instances in t[1].values()), reverse=True)
+        {'elfs': [str(elf_list[elf_id]) for elf_id in array('i', elf_ids_bytes)], **features_dict}
+        for elf_ids_bytes, features_dict in sorted(grouped_by_elf_set.items(), key=lambda t: sum(len(instances) for instances in t[1].values()), reverse=True)
     ]
 
-    ordered_aggr_by_num_origins_counts = {
-        key: {
-            feature_type: {k: v for k, v in sorted(counters_dict[feature_type].items(), key=itemgetter(0))}
+    # Histogram the num-origins values per feature type with bincount on the
+    # arrays computed above, instead of three Counter increments per group in
+    # the classification loop plus a sort of every counter at the end (the
+    # dense bins come out in ascending key order by construction).
+    feature_type_ids = {feature_type: i for i, feature_type in enumerate(sorted_feature_types)}
+    group_feature_type_ids = np.fromiter(
+        (feature_type_ids[feature_type] for locations_dict in inst_to_locations.values() for feature_type in locations_dict),
+        np.int64,
+        count=len(groups),
+    )
+    if global_uniqueness:
+        # Every feature type of an instance was counted with the instance's
+        # global num_origins; repeat the per-instance values accordingly.
+        num_feature_types_per_inst = [len(locations_dict) for locations_dict in inst_to_locations.values()]
+        counted_values = (
+            np.repeat(num_elfs_per_inst, num_feature_types_per_inst),
+            np.repeat(num_binary_pkgs_per_inst, num_feature_types_per_inst),
+            np.repeat(num_source_pkgs_per_inst, num_feature_types_per_inst),
+        )
+    else:
+        counted_values = (
+            num_elfs_per_group,
+            num_binary_pkgs_per_group,
+            num_source_pkgs_per_group,
+        )
+
+    ordered_aggr_by_num_origins_counts = {}
+    for key, values in zip(('elfs', 'binary_pkgs', 'source_pkgs'), counted_values):
+        num_bins = int(values.max(initial=0)) + 1
+        counts = np.bincount(
+            group_feature_type_ids * num_bins + values,
+            minlength=len(sorted_feature_types) * num_bins,
+        ).reshape(len(sorted_feature_types), num_bins)
+        ordered_aggr_by_num_origins_counts[key] = {
+            feature_type: {k: int(c) for k, c in enumerate(counts[feature_type_ids[feature_type]]) if c}
             for feature_type in sorted_feature_types
         }
-        for key, counters_dict in aggr_by_num_origins_counts.items()
-    }
 
-    with open(output_dir / 'classified-aggregated.json', 'w', encoding='utf-8') as f:
-        json.dump({'$comment': JSON_COMMENT, **ordered_aggr_features}, f, ensure_ascii=False, allow_nan=False, indent=2, cls=NoIndentEncoder)
-
-    with open(output_dir / 'classified-aggregated-strings-by-len.json', 'w', encoding='utf-8') as f:
-        json.dump(ordered_aggr_strings_by_len, f, ensure_ascii=False, allow_nan=False, indent=2)
-
-    with open(output_dir / 'classified-aggregated-strings-by-len-counts.json', 'w', encoding='utf-8') as f:
-        json.dump(ordered_aggr_strings_by_len_counts, f, ensure_ascii=False, allow_nan=False, indent=2, cls=NoIndentEncoder)
-
-    with open(output_dir / 'aggregated-by-num-origins-counts.json', 'w', encoding='utf-8') as f:
-        json.dump(ordered_aggr_by_num_origins_counts, f, ensure_ascii=False, allow_nan=False, indent=2)
-
-    with open(output_dir / 'classified-per-elfs.json', 'w', encoding='utf-8') as f:
-        json.dump(elf_to_features_classified, f, ensure_ascii=False, allow_nan=False, indent=2)
-
-    with open(output_dir / 'not-unique-grouped-by-elf-set.json', 'w', encoding='utf-8') as f:
-        json.dump(ordered_grouped_by_elf_set, f, ensure_ascii=False, allow_nan=False, indent=2)
+    # The big dumps are streamed one top-level entry at a time: the encoder
+    # then never holds more than one entry's bytes on top of the Python
+    # objects, instead of a buffer the size of the whole file.
+    with open(output_dir / 'classified-aggregated.json', 'wb') as f:
+        first = True
+        for key, value in itertools.chain([('$comment', JSON_COMMENT)], ordered_aggr_features.items()):
+            write_indented_entry(f, key, value, first)
+            first = False
+        f.write(b'{}' if first else b'\n}')
+
+    with open(output_dir / 'classified-aggregated-strings-by-len.json', 'wb') as f:
+        first = True
+        for len_s, strings_dict in ordered_aggr_strings_by_len.items():
+            write_indented_entry(f, len_s, strings_dict, first)
+            first = False
+        f.write(b'{}' if first else b'\n}')
+
+    with open(output_dir / 'classified-aggregated-strings-by-len-counts.json', 'wb') as f:
+        f.write(orjson.dumps(ordered_aggr_strings_by_len_counts, option=ORJSON_OPTS))
+
+    with open(output_dir / 'aggregated-by-num-origins-counts.json', 'wb') as f:
+        f.write(orjson.dumps(ordered_aggr_by_num_origins_counts, option=ORJSON_OPTS))
+
+    # Shared empty leaves for the dump below: orjson serializes a tuple as a
+    # JSON array, and the template is only read, never mutated.
+    EMPTY_BUCKETS = {uniq_class: () for uniq_class in UNIQ_CLASSES}
+
+    with open(output_dir / 'classified-per-elfs.json', 'wb') as f:
+        first = True
+        for elf_id, (elf_path, features_dict) in enumerate(elf_to_features.items()):
+            features_classified = elfs_classified[elf_id]
+            # Expand the sparse buckets back into the full template, in the
+            # fixed feature-type and uniq-class order of the old eager dicts.
+            full_features_dict = {
+                feature_type: (
+                    {uniq_class: buckets.get(uniq_class, ()) for uniq_class in UNIQ_CLASSES}
+                    if (buckets := features_classified.get(feature_type)) is not None
+                    else EMPTY_BUCKETS
+                )
+                for feature_type in features_dict
+            }
+            write_indented_entry(f, str(elf_path), full_features_dict, first)
+            first = False
+        f.write(b'{}' if first else b'\n}')
+
+    with open(output_dir / 'not-unique-grouped-by-elf-set.json', 'wb') as f:
+        first = True
+        for entry in ordered_grouped_by_elf_set:
+            write_indented_element(f, entry, first)
+            first = False
+        f.write(b'[]' if first else b'\n]')
 
 def usage(prog_name: str) -> None:
     print(file=sys.stderr)
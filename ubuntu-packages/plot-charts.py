@@ -1,18 +1,18 @@
 #!/usr/bin/env python3
 
-import json
+import itertools
 import sys
 import textwrap
-from collections import Counter
 from collections.abc import Iterable
-from operator import itemgetter
 from pathlib import Path
 from typing import Any
 
 import matplotlib
-import matplotlib.pyplot as plt
+import matplotlib.ticker
 import numpy as np
+import orjson
 from matplotlib.axes import Axes
+from matplotlib.figure import Figure
 
 UNIQ_CLASSES_AND_LABELS = [
     ('elf_unique', 'ELF-unique'),
@@ -32,8 +32,9 @@ FEAT_TYPE_TO_LABEL = {
 
 
 def read_json(file_path: Path) -> dict[str, Any]:
-    with open(file_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    # orjson parses the multi-MB dumps several times faster than stdlib json
+    # and works on the raw UTF-8 bytes directly.
+    return orjson.loads(file_path.read_bytes())
 
 
 def reduce_num_features_classified_data_set(full_data_set: dict[str, dict[str, int]], max_num_feature_types: int) -> dict[str, dict[str, int]]:
@@ -42,14 +43,16 @@ def reduce_num_features_classified_data_set(full_data_set: dict[str, dict[str, i
     if len(all_feature_types) > max_num_feature_types:
         feature_types = all_feature_types[:max_num_feature_types - 1]
         data_set = {feat_type: full_data_set[feat_type] for feat_type in feature_types}
-        feature_types_set = set(feature_types)
+        # One pass over the collapsed tail instead of one generator sweep per
+        # uniqueness class. The kept feature types are a prefix of
+        # full_data_set, so the tail is a plain islice - no membership tests.
+        tail = np.array([
+            [uniq_class_stats[uniq_class] for uniq_class, _ in UNIQ_CLASSES_AND_LABELS]
+            for uniq_class_stats in itertools.islice(full_data_set.values(), len(feature_types), None)
+        ])
         data_set[''] = {
-            uniq_class: sum(
-                uniq_class_stats[uniq_class]
-                for feat_type, uniq_class_stats in full_data_set.items()
-                if feat_type not in feature_types_set
-            )
-            for uniq_class, _ in UNIQ_CLASSES_AND_LABELS
+            uniq_class: int(total)
+            for (uniq_class, _), total in zip(UNIQ_CLASSES_AND_LABELS, tail.sum(axis=0))
         }
     else:
         data_set = full_data_set
@@ -57,54 +60,60 @@ def reduce_num_features_classified_data_set(full_data_set: dict[str, dict[str, i
     return data_set
 
 
-def plot_num_features_classified_absolute(data_set: dict[str, dict[str, int]], output_filename: Path):
+def data_set_to_counts(data_set: dict[str, dict[str, int]]) -> np.ndarray:
+    """Convert a classified data set to one (num_feature_types, 4) array.
+
+    Walked once here and shared by both classified plots, instead of each
+    re-traversing the nested dicts.
+    """
+    return np.array([
+        [uniq_class_stats[uniq_class] for uniq_class, _ in UNIQ_CLASSES_AND_LABELS]
+        for uniq_class_stats in data_set.values()
+    ])
+
+
+def plot_num_features_classified_absolute(feat_type_labels: list[str], counts: np.ndarray, output_filename: Path):
     # See https://matplotlib.org/stable/gallery/lines_bars_and_markers/bar_stacked.html
-    data = {
-        feat_type: np.array([uniq_class_stats[uniq_class] for uniq_class, _ in UNIQ_CLASSES_AND_LABELS])
-        for feat_type, uniq_class_stats in data_set.items()
-    }
+    data = counts
     uniq_class_labels = [textwrap.fill(label, 14) for _, label in UNIQ_CLASSES_AND_LABELS]
 
-    fig, ax = plt.subplots()
-    bottom = np.zeros(len(uniq_class_labels))
+    # All stacked-bar bottoms in one vectorized exclusive prefix sum.
+    bottoms = np.cumsum(data, axis=0) - data
 
-    for feat_type, uniq_class_stats in data.items():
-        feat_type_label = FEAT_TYPE_TO_LABEL.get(feat_type, feat_type)
+    fig = Figure()
+    ax = fig.add_subplot()
+
+    for feat_type_label, uniq_class_stats, bottom in zip(feat_type_labels, data, bottoms):
         ax.bar(uniq_class_labels, uniq_class_stats, label=feat_type_label, bottom=bottom)
-        bottom += uniq_class_stats
 
-    ax.yaxis.set_major_formatter(matplotlib.ticker.FuncFormatter(lambda x, _: f'{int(x):,}'))
+    ax.yaxis.set_major_formatter(matplotlib.ticker.StrMethodFormatter('{x:,.0f}'))
     ax.set_title("Number of extracted features from ELFs classified by uniqueness")
     ax.legend(loc='upper right')
 
     fig.savefig(output_filename)
 
 
-def plot_num_features_classified_relative(data_set: dict[str, dict[str, int]], output_filename: Path, rotated_xlabels: bool):
+def plot_num_features_classified_relative(feat_type_labels: list[str], counts: np.ndarray, output_filename: Path, rotated_xlabels: bool):
     # See https://matplotlib.org/stable/gallery/lines_bars_and_markers/bar_stacked.html
-    totals = {
-        feat_type: sum(uniq_class_stats[uniq_class] for uniq_class, _ in UNIQ_CLASSES_AND_LABELS)
-        for feat_type, uniq_class_stats in data_set.items()
-    }
-
-    data = {
-        uniq_class: np.array([uniq_class_stats[uniq_class] / totals[feat_type] for feat_type, uniq_class_stats in data_set.items()])
-        for uniq_class, _ in UNIQ_CLASSES_AND_LABELS
-    }
-    feat_type_labels = [FEAT_TYPE_TO_LABEL.get(feat_type, feat_type) for feat_type in data_set.keys()]
+    totals = counts.sum(axis=1)
+    # The ratios of all uniqueness classes in one vectorized division; the
+    # per-class columns are sliced out below.
+    data = counts / totals[:, np.newaxis]
+
     if not rotated_xlabels:
         feat_type_labels = [textwrap.fill(label, 14) for label in feat_type_labels]
 
-    fig, ax = plt.subplots()
-    bottom = np.zeros(len(feat_type_labels))
+    # All stacked-bar bottoms in one vectorized exclusive prefix sum.
+    bottoms = np.cumsum(data, axis=1) - data
+
+    fig = Figure()
+    ax = fig.add_subplot()
     bars = []
 
-    for uniq_class, uniq_class_label in UNIQ_CLASSES_AND_LABELS:
-        d = data[uniq_class]
-        bars.append(ax.bar(feat_type_labels, d, label=uniq_class_label, bottom=bottom))
-        bottom += d
+    for uniq_class_idx, (uniq_class, uniq_class_label) in enumerate(UNIQ_CLASSES_AND_LABELS):
+        bars.append(ax.bar(feat_type_labels, data[:, uniq_class_idx], label=uniq_class_label, bottom=bottoms[:, uniq_class_idx]))
 
-    ax.bar_label(bars[-1], labels=[f'{totals[feat_type]:,}' for feat_type in data_set.keys()])
+    ax.bar_label(bars[-1], labels=[f'{total:,}' for total in totals])
     if rotated_xlabels:
         ax.set_xticks(feat_type_labels, feat_type_labels, rotation=30, horizontalalignment='right')
 
@@ -117,7 +126,7 @@ def plot_num_features_classified_relative(data_set: dict[str, dict[str, int]], o
     fig.savefig(output_filename)
 
 
-def plot_num_strings_by_len_classified(data_set: dict[int, dict[str, int]], output_filename: Path):
+def plot_num_strings_by_len_classified(data_set: dict[str, dict[str, int]], output_filename: Path):
     # Basically, we want a histogram like this: https://labwrite.ncsu.edu/res/gh/gh-bargraph.html#histogram
 
     data = np.array([
@@ -125,23 +134,34 @@ def plot_num_strings_by_len_classified(data_set: dict[int, dict[str, int]], outp
         for stats in data_set.values()
     ])
 
+    # The string keys come straight from JSON; parsing them into one small
+    # int array here beats rebuilding the whole dict with int keys upfront.
+    lens = np.fromiter(map(int, data_set), np.int64, count=len(data_set))
+
     # See https://stackoverflow.com/a/30305331/12940655
-    bins = np.arange(min(data_set.keys()), 100 + 2)
-    str_lens = np.clip(list(data_set.keys()), bins[0], bins[-1])
-    uniq_class_labels = [label for _, label in UNIQ_CLASSES_AND_LABELS]
-
-    fig, ax = plt.subplots(layout='constrained', figsize=(6, 9))
-
-    ax.hist(
-        np.repeat(str_lens[:, np.newaxis], len(UNIQ_CLASSES_AND_LABELS), axis=1),
-        bins=bins,
-        weights=data,
-        histtype='bar',
-        orientation='horizontal',
-        stacked=True,
-        label=uniq_class_labels,
-        rwidth=0.8,
-    )
+    bins = np.arange(lens.min(), 100 + 2)
+
+    # The data is already binned counts, so fold the overflow lengths into
+    # the last bin and draw the stacked bars directly - ax.hist would re-run
+    # its whole histogram machinery (on an np.repeat'ed copy of the lengths)
+    # just to arrive at the same per-bin sums.
+    bin_idxs = np.minimum(lens - bins[0], len(bins) - 2)
+    # One weighted bincount per uniqueness class: the specialized primitive
+    # for uniform integer bins, and faster than the generic np.add.at.
+    counts = np.column_stack([
+        np.bincount(bin_idxs, weights=data[:, uniq_class_idx], minlength=len(bins) - 1)
+        for uniq_class_idx in range(len(UNIQ_CLASSES_AND_LABELS))
+    ])
+
+    # All stacked-bar offsets in one vectorized exclusive prefix sum.
+    lefts = np.cumsum(counts, axis=1) - counts
+
+    fig = Figure(layout='constrained', figsize=(6, 9))
+    ax = fig.add_subplot()
+
+    for uniq_class_idx, (_, uniq_class_label) in enumerate(UNIQ_CLASSES_AND_LABELS):
+        # rwidth=0.8 of ax.hist: bars 0.8 of a bin wide, centered in the bin.
+        ax.barh(bins[:-1] + 0.5, counts[:, uniq_class_idx], height=0.8, left=lefts[:, uniq_class_idx], label=uniq_class_label)
     yticks = bins[:-1:2] + 0.5
     ylabels = bins[:-1:2].astype(str)
     ylabels[-1] += '+'
@@ -149,13 +169,13 @@ def plot_num_strings_by_len_classified(data_set: dict[int, dict[str, int]], outp
     ax.set_yticklabels(ylabels)
     ax.legend(loc='lower right')
     ax.invert_yaxis()
-    ax.xaxis.set_major_formatter(matplotlib.ticker.FuncFormatter(lambda x, _: f'{int(x):,}'))
+    ax.xaxis.set_major_formatter(matplotlib.ticker.StrMethodFormatter('{x:,.0f}'))
     ax.set_title("Number of strings extracted from ELFs grouped by length, classified by uniqueness", wrap=True)
 
     fig.savefig(output_filename)
 
 
-def plot_num_features_aggregated_by_num_origins(full_data_sets: dict[str, dict[str, dict[int, int]]], output_filename: Path, max_num_feature_types: int):
+def plot_num_features_aggregated_by_num_origins(full_data_sets: dict[str, dict[str, dict[str, int]]], output_filename: Path, max_num_feature_types: int):
     assert max_num_feature_types >= 1
     subplots_info = [
         ('elfs', "grouped by the number of ELFs", "Number of ELFs"),
@@ -177,50 +197,50 @@ def plot_num_features_aggregated_by_num_origins(full_data_sets: dict[str, dict[s
             data_set_key: {feat_type: full_data_set[feat_type] for feat_type in feature_types}
             for data_set_key, full_data_set in full_data_sets.items()
         }
-        feature_types_set = set(feature_types)
         for data_set_key, full_data_set in full_data_sets.items():
-            others = Counter()
-            for feat_type, counter in full_data_set.items():
-                if feat_type in feature_types_set:
-                    continue
-                others += Counter(counter)
-            data_sets[data_set_key][''] = {k: v for k, v in sorted(others.items(), key=itemgetter(0))}
+            # Sum the collapsed tail with one bincount over all its
+            # (num_origins, count) items instead of a Counter merge per
+            # feature type; the dense bins come out in ascending key order.
+            # The kept feature types are a prefix of full_data_set, so the
+            # tail is a plain islice - no membership tests.
+            tail_counters = list(itertools.islice(full_data_set.values(), len(feature_types), None))
+            keys = np.fromiter((int(k) for counter in tail_counters for k in counter), np.int64)
+            values = np.fromiter((v for counter in tail_counters for v in counter.values()), np.int64, count=len(keys))
+            others = np.bincount(keys, weights=values)
+            data_sets[data_set_key][''] = {k: int(v) for k, v in enumerate(others) if v}
     else:
         data_sets = full_data_sets
 
     feat_type_labels = [FEAT_TYPE_TO_LABEL.get(feat_type, feat_type) for feat_type in data_sets[subplots_info[0][0]]]
 
-    fig, axs = plt.subplots(1, len(subplots_info), layout='constrained', figsize=(15, 6), sharey=True)
+    fig = Figure(layout='constrained', figsize=(15, 6))
+    axs = fig.subplots(1, len(subplots_info), sharey=True)
     axs: Iterable[Axes]
 
     for subplot_info, ax in zip(subplots_info, axs, strict=True):
         data_set_key, subplot_title, subplot_xlabel = subplot_info
-        data = [
-            list(counter.values())
-            for counter in data_sets[data_set_key].values()
-        ]
 
         bins = np.arange(1, 5 + 2)
-        num_origins = [
-            np.clip([int(k) for k in counter], bins[0], bins[-1])
-            for counter in data_sets[data_set_key].values()
-        ]
-        ax.hist(
-            num_origins,
-            bins=bins,
-            weights=data,
-            histtype='bar',
-            stacked=True,
-            label=feat_type_labels,
-            rwidth=0.75,
-        )
+        # Again pre-binned counts: fold everything beyond the last bin into
+        # it and stack the bars directly instead of going through ax.hist.
+        counts = np.zeros((len(bins) - 1, len(data_sets[data_set_key])))
+        for feat_type_idx, counter in enumerate(data_sets[data_set_key].values()):
+            # int() accepts both the JSON string keys and the int keys of the
+            # synthesized '' tail counter.
+            bin_idxs = np.minimum(np.fromiter(map(int, counter.keys()), np.int64, count=len(counter)) - bins[0], len(bins) - 2)
+            np.add.at(counts[:, feat_type_idx], bin_idxs, np.fromiter(counter.values(), np.int64, count=len(counter)))
+
+        bottoms = np.cumsum(counts, axis=1) - counts
+        for feat_type_idx, feat_type_label in enumerate(feat_type_labels):
+            # rwidth=0.75 of ax.hist: bars 0.75 of a bin wide, centered.
+            ax.bar(bins[:-1] + 0.5, counts[:, feat_type_idx], width=0.75, bottom=bottoms[:, feat_type_idx], label=feat_type_label)
         xlabels = bins[:-1].astype(str)
         xlabels[-1] += '+'
         ax.set_xticks(bins[:-1] + 0.5)
         ax.set_xticklabels(xlabels)
         ax.set_xlabel(subplot_xlabel)
 
-        ax.yaxis.set_major_formatter(matplotlib.ticker.FuncFormatter(lambda x, _: f'{int(x):,}'))
+        ax.yaxis.set_major_formatter(matplotlib.ticker.StrMethodFormatter('{x:,.0f}'))
         ax.legend(loc='upper right')
         ax.set_title(subplot_title)
 
@@ -235,29 +255,30 @@ def plot_charts(dumps_dir: Path, output_dir: Path) -> None:
     aggregated_counts = read_json(dumps_dir / 'classified-aggregated-counts.json')
     reduced_aggregated_counts = reduce_num_features_classified_data_set(aggregated_counts['absolute'], MAX_NUM_FEATURE_TYPES)
 
+    reduced_aggregated_counts_arr = data_set_to_counts(reduced_aggregated_counts)
+    # Resolved once so both classified plots are guaranteed the same labels.
+    feat_type_labels = [FEAT_TYPE_TO_LABEL.get(feat_type, feat_type) for feat_type in reduced_aggregated_counts]
+
     plot_num_features_classified_absolute(
-        reduced_aggregated_counts,
+        feat_type_labels,
+        reduced_aggregated_counts_arr,
         output_dir / 'num-features-classified-absolute.svg',
     )
     ROTATED_XLABELS = True
     plot_num_features_classified_relative(
-        reduced_aggregated_counts,
+        feat_type_labels,
+        reduced_aggregated_counts_arr,
         output_dir / 'num-features-classified-relative.svg',
         ROTATED_XLABELS,
     )
-    strings_by_len_orig = read_json(dumps_dir / 'classified-aggregated-strings-by-len-counts.json')
+    strings_by_len = read_json(dumps_dir / 'classified-aggregated-strings-by-len-counts.json')
     plot_num_strings_by_len_classified(
-        {int(k): v for k, v in strings_by_len_orig.items()},
+        strings_by_len,
         output_dir / 'num-strings-by-len-classified.svg',
     )
-    features_by_num_origins_orig: dict[str, dict[str, dict[str, int]]] = read_json(dumps_dir / 'aggregated-by-num-origins-counts.json')
-    features_by_num_origins = {
-        data_set_key: {
-            feat_type: {int(k): v for k, v in counter.items()}
-            for feat_type, counter in data_set.items()
-        }
-        for data_set_key, data_set in features_by_num_origins_orig.items()
-    }
+    # The plot functions parse the numeric JSON string keys into small int
+    # arrays themselves, so no int-keyed rebuild of these dicts is needed.
+    features_by_num_origins: dict[str, dict[str, dict[str, int]]] = read_json(dumps_dir / 'aggregated-by-num-origins-counts.json')
     plot_num_features_aggregated_by_num_origins(
         features_by_num_origins,
         output_dir / 'num-features-by-num-origins.svg',
@@ -289,7 +310,7 @@ def main(argv: list[str]) -> int:
     output_dir.mkdir(exist_ok=True)
 
     # Preserve text as strings in output SVGs, see https://matplotlib.org/stable/users/explain/text/fonts.html#fonts-in-svg
-    with plt.rc_context({'svg.fonttype': 'none'}):
+    with matplotlib.rc_context({'svg.fonttype': 'none'}):
         plot_charts(dumps_dir, output_dir)
 
     return 0
@@ -1,38 +1,15 @@
 import json
-import uuid
 
 
-# Adapted from https://stackoverflow.com/a/25935321/12940655
-class NoIndent:
-    def __init__(self, value):
-        self.value = value
+def write_json_entry(f, key: str, value, first: bool) -> None:
+    """Append one `"key": value` entry to an open top-level JSON object.
 
-
-# Adapted from https://stackoverflow.com/a/25935321/12940655
-class NoIndentEncoder(json.JSONEncoder):
-    def __init__(self, *args, **kwargs):
-        super(NoIndentEncoder, self).__init__(*args, **kwargs)
-        self.kwargs = dict(kwargs)
-        del self.kwargs['indent']
-        self._replacement_map = {}
-
-    def _do_replacement_on_part(self, part: str):
-        if part.startswith('"@@'):
-            try:
-                return self._replacement_map[part[3:-3]]
-            except KeyError:
-                return part
-        else:
-            return part
-
-    def default(self, o):
-        if isinstance(o, NoIndent):
-            key = uuid.uuid4().hex
-            self._replacement_map[key] = json.dumps(o.value, **self.kwargs)
-            return '@@%s@@' % (key,)
-        else:
-            return super().default(o)
-
-    def iterencode(self, o, _one_shot=False):
-        parts = super().iterencode(o, _one_shot)
-        return map(self._do_replacement_on_part, parts)
+    The entry value is written compactly (one line per entry): these files
+    are consumed by the other scripts, not read by humans, and without
+    `indent` json stays on its C-accelerated encoder. Streaming entry by
+    entry keeps peak memory at a single entry.
+    """
+    f.write('\n' if first else ',\n')
+    f.write(json.dumps(key, ensure_ascii=False))
+    f.write(': ')
+    f.write(json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(',', ':')))
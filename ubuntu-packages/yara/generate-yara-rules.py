@@ -1,19 +1,20 @@
 #!/usr/bin/env python3
 
 import argparse
-import itertools
-import json
 import random
 import re
 from pathlib import Path, PurePosixPath
 from typing import Any
 
+import orjson
+
 from yara_config import YaraConfig
 
 
 def read_json(file_path: Path) -> dict[str, Any]:
-    with open(file_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    # orjson parses the big feature dumps several times faster than stdlib
+    # json and works on the raw UTF-8 bytes directly.
+    return orjson.loads(file_path.read_bytes())
 
 # Extracted from BANG: https://github.com/armijnhemel/binaryanalysis-ng/blob/e05071e01213c7d7d7261e979ab1d308872e87d0/maintenance/yara/yara_from_bang.py#L41-L48
 # YARA escape sequences
@@ -24,6 +25,10 @@ ESCAPE = str.maketrans({'"': '\\"',
 
 INVALID_IDENT_CHAR_RE = re.compile(r'[^A-Za-z0-9_]')
 
+# Seeded so that re-running the generator over the same inputs reproduces the
+# same rules even when the identifier limit forces sampling.
+rng = random.Random(0)
+
 
 def translate_string_for_yara(s: str) -> str:
     translated_s = s.translate(ESCAPE)
@@ -42,15 +47,15 @@ def generate_yara(rule_id, yara_file, metadata, functions, variables, strings,
                   yara_operator, identifiers_from) -> None:
     '''Generate YARA rules from identifiers.'''
     total_identifiers = len(functions) + len(variables) + len(strings)
-    meta = f'''
+    meta_parts = [f'''
     meta:
         description = "Rule for {metadata['name']}"
         total_identifiers = {total_identifiers}
         identifiers_from = {translate_string_for_yara(identifiers_from)}
-'''
+''']
 
-    for m in sorted(metadata):
-        meta += f'        {m} = {translate_string_for_yara(metadata[m])}\n'
+    meta_parts.extend(f'        {m} = {translate_string_for_yara(metadata[m])}\n' for m in sorted(metadata))
+    meta = ''.join(meta_parts)
 
     # create a tags string for the rule if there are any tags.
     # These can be used by YARA to only run specific rules.
@@ -60,53 +65,58 @@ def generate_yara(rule_id, yara_file, metadata, functions, variables, strings,
 
     rule_name = f'rule {rule_id}{tags_string}\n'
 
-    with yara_file.open(mode='w') as p:
-        p.write(rule_name)
-        p.write('{')
-        p.write(meta)
-        p.write('\n    strings:\n')
-
-        # First write all strings
-        if strings != []:
-            p.write("\n        // Extracted strings\n\n")
-            for counter, s_raw in enumerate(strings, 1):
-                s = translate_string_for_yara(s_raw)
-                p.write(f"        $string{counter} = {s}{fullword}\n")
-
-        # Then write the functions
-        if functions != []:
-            p.write("\n        // Extracted functions\n\n")
-            counter = 1
-            for counter, s_raw in enumerate(functions, 1):
-                s = translate_string_for_yara(s_raw)
-                p.write(f"        $function{counter} = {s}{fullword}\n")
-
-        # Then the variable names
-        if variables != []:
-            p.write("\n        // Extracted variables\n\n")
-            for counter, s_raw in enumerate(variables, 1):
-                s = translate_string_for_yara(s_raw)
-                p.write(f"        $variable{counter} = {s}{fullword}\n")
-
-        # Finally write the conditions
-        p.write('\n    condition:\n')
-        if strings != []:
-            p.write(f'        {num_strings} of ($string*)')
-
-            if not (functions == [] and variables == []):
-                p.write(f' {yara_operator}\n')
-            else:
-                p.write('\n')
-        if functions != []:
-            p.write(f'        {num_funcs} of ($function*)')
+    # Assemble the whole rule in memory and write it with one call instead
+    # of issuing one tiny write() per line. The escape table is applied
+    # inline: no translate_string_for_yara call frame per identifier.
+    escape = ESCAPE
+    parts = [rule_name, '{', meta, '\n    strings:\n']
+
+    # First write all strings; one str.join per identifier kind instead of
+    # one list append per identifier.
+    if strings != []:
+        parts.append("\n        // Extracted strings\n\n")
+        parts.append(''.join(
+            f'        $string{counter} = "{s_raw.translate(escape)}"{fullword}\n'
+            for counter, s_raw in enumerate(strings, 1)
+        ))
+
+    # Then write the functions
+    if functions != []:
+        parts.append("\n        // Extracted functions\n\n")
+        parts.append(''.join(
+            f'        $function{counter} = "{s_raw.translate(escape)}"{fullword}\n'
+            for counter, s_raw in enumerate(functions, 1)
+        ))
+
+    # Then the variable names
+    if variables != []:
+        parts.append("\n        // Extracted variables\n\n")
+        parts.append(''.join(
+            f'        $variable{counter} = "{s_raw.translate(escape)}"{fullword}\n'
+            for counter, s_raw in enumerate(variables, 1)
+        ))
+
+    # Finally write the conditions
+    parts.append('\n    condition:\n')
+    if strings != []:
+        parts.append(f'        {num_strings} of ($string*)')
+
+        if not (functions == [] and variables == []):
+            parts.append(f' {yara_operator}\n')
+        else:
+            parts.append('\n')
+    if functions != []:
+        parts.append(f'        {num_funcs} of ($function*)')
 
-            if variables != []:
-                p.write(' %s\n' % yara_operator)
-            else:
-                p.write('\n')
         if variables != []:
-            p.write(f'        {num_vars} of ($variable*)')
-        p.write('\n}\n')
+            parts.append(' %s\n' % yara_operator)
+        else:
+            parts.append('\n')
+    if variables != []:
+        parts.append(f'        {num_vars} of ($variable*)')
+    parts.append('\n}\n')
+
+    yara_file.write_text(''.join(parts), encoding='utf-8')
 
     # # return the UUID for the rule so it can be recorded
     # return rule_uuid
@@ -115,10 +125,6 @@ def generate_yara(rule_id, yara_file, metadata, functions, variables, strings,
 def binary(rule_id: str, metadata: dict[str, str], features_dict: dict[str, list[str]], yara_env: dict[str, Any], yara_directory: Path,
            no_strings: bool, no_functions: bool, no_variables: bool, identifiers_from: str):
 
-    strings = set()
-    functions = set()
-    variables = set()
-
     heuristics = yara_env['heuristics']
 
     # lq_identifiers = {
@@ -162,32 +168,37 @@ def binary(rule_id: str, metadata: dict[str, str], features_dict: dict[str, list
     #     },
     # }
 
-    # process strings
+    # process strings; insertion-ordered dicts double as dedup sets, so
+    # sorted() later works straight off the keys
+    strings: dict[str, None] = {}
     if not no_strings:
-        for s in features_dict['strings']:
-            if len(s) < yara_env['string_minimum_length']:
-                continue
-            if len(s) > yara_env['string_maximum_length']:
-                continue
+        # hoisted to locals: the filter condition runs once per string
+        min_len = yara_env['string_minimum_length']
+        max_len = yara_env['string_maximum_length']
+        strings = dict.fromkeys(
+            s for s in features_dict['strings']
+            if min_len <= len(s) <= max_len
             # ignore whitespace-only strings
-            if s.isspace():
-                continue
-            # if s in lq_identifiers['elf']['strings']:
-            #     continue
-            strings.add(s)
+            and not s.isspace()
+            # and s not in lq_identifiers['elf']['strings']
+        )
 
     # process symbols, split in functions and variables
+    identifier_cutoff = yara_env['identifier_cutoff']
+
+    functions: dict[str, None] = {}
     if not no_functions:
-        for s in features_dict['defined_functions']:
-            if len(s) < yara_env['identifier_cutoff']:
-                continue
-            functions.add(s)
+        functions = dict.fromkeys(
+            s for s in features_dict['defined_functions']
+            if len(s) >= identifier_cutoff
+        )
 
+    variables: dict[str, None] = {}
     if not no_variables:
-        for s in features_dict['defined_objects']:
-            if len(s) < yara_env['identifier_cutoff']:
-                continue
-            variables.add(s)
+        variables = dict.fromkeys(
+            s for s in features_dict['defined_objects']
+            if len(s) >= identifier_cutoff
+        )
 
     # for s in bang_data['symbols']:
     #     # if s['section_index'] == 0:
@@ -212,24 +223,28 @@ def binary(rule_id: str, metadata: dict[str, str], features_dict: dict[str, list
     #             continue
     #         variables.add(identifier_name)
 
+    strings_extracted = heuristics['strings_extracted']
+    functions_extracted = heuristics['functions_extracted']
+    variables_extracted = heuristics['variables_extracted']
+
     # do not generate a YARA file if there is no data
     if \
         (
-            len(strings) < heuristics['strings_extracted'] and
-            len(functions) < heuristics['functions_extracted'] and
-            len(variables) < heuristics['variables_extracted']
+            len(strings) < strings_extracted and
+            len(functions) < functions_extracted and
+            len(variables) < variables_extracted
         ):
         print(f"{metadata['name']}: not generating a YARA rule - only {len(strings)} strings, {len(functions)} functions and {len(variables)} variables")
         return
 
     # check if the number of identifiers passes a threshold.
     # If not assume that there are no identifiers.
-    if len(strings) < heuristics['strings_extracted']:
-        strings = set()
-    if len(functions) < heuristics['functions_extracted']:
-        functions = set()
-    if len(variables) < heuristics['variables_extracted']:
-        variables = set()
+    if len(strings) < strings_extracted:
+        strings = {}
+    if len(functions) < functions_extracted:
+        functions = {}
+    if len(variables) < variables_extracted:
+        variables = {}
 
     # yara_tags = sorted(set(tags + [exec_type]))
     yara_tags = []
@@ -241,15 +256,15 @@ def binary(rule_id: str, metadata: dict[str, str], features_dict: dict[str, list
     if total_identifiers > yara_env['max_identifiers']:
         over_limit = total_identifiers - yara_env['max_identifiers']
         if len(strings) - over_limit >= 4000:
-            strings = random.sample(list(strings), k=len(strings) - over_limit)
+            strings = rng.sample(list(strings), k=len(strings) - over_limit)
         elif len(functions) - over_limit >= 4000:
-            functions = random.sample(list(functions), k=len(functions) - over_limit)
+            functions = rng.sample(list(functions), k=len(functions) - over_limit)
         else:
             if len(strings) > 4000:
                 over_limit -= len(strings) - 4000
-                strings = random.sample(list(strings), k=4000)
+                strings = rng.sample(list(strings), k=4000)
             if len(functions) - over_limit >= 2500:
-                functions = random.sample(list(functions), k=len(functions) - over_limit)
+                functions = rng.sample(list(functions), k=len(functions) - over_limit)
             else:
                 print(f"{metadata['name']}: number of identifiers {total_identifiers} ({len(strings)} strings, {len(functions)} functions and {len(variables)} variables) exceeds limit of {yara_env['max_identifiers']}")
                 return
@@ -262,17 +277,16 @@ def binary(rule_id: str, metadata: dict[str, str], features_dict: dict[str, list
 
     num_strings = num_funcs = num_vars = 'any'
 
+    # len * percentage // 100 stays in exact integer arithmetic; truncating
+    # after max() is the same as before it, since the matched floor is an int.
     if len(strings) >= heuristics['strings_minimum_present']:
-        # num_strings = str(int(max(len(strings)//heuristics['strings_percentage'], heuristics['strings_matched'])))
-        num_strings = int(max(len(strings) * (heuristics['strings_percentage'] / 100), heuristics['strings_matched']))
+        num_strings = max(len(strings) * heuristics['strings_percentage'] // 100, heuristics['strings_matched'])
 
     if len(functions) >= heuristics['functions_minimum_present']:
-        # num_funcs = str(int(max(len(functions)//heuristics['functions_percentage'], heuristics['functions_matched'])))
-        num_funcs = int(max(len(functions) * (heuristics['functions_percentage'] / 100), heuristics['functions_matched']))
+        num_funcs = max(len(functions) * heuristics['functions_percentage'] // 100, heuristics['functions_matched'])
 
     if len(variables) >= heuristics['variables_minimum_present']:
-        # num_vars = str(int(max(len(variables)//heuristics['variables_percentage'], heuristics['variables_matched'])))
-        num_vars = int(max(len(variables) * (heuristics['variables_percentage'] / 100), heuristics['variables_matched']))
+        num_vars = max(len(variables) * heuristics['variables_percentage'] // 100, heuristics['variables_matched'])
 
     generate_yara(rule_id, yara_file, metadata, sorted(functions), sorted(variables),
                   sorted(strings), yara_tags, num_strings, num_funcs, num_vars,
@@ -305,15 +319,18 @@ def main() -> None:
         elf_to_features: dict[str, dict[str, list[str]]] = read_json(src_file)
     else:
         src_file = args.from_blobs
-        elf_to_features: dict[str, dict[str, list[str]]] = read_json(args.from_blobs)
-        elf_to_features = {
-            elf_path: {
-                'strings': list(itertools.chain.from_iterable(features_dict.values())),
+        elf_to_features: dict[str, dict[str, list[str]]] = read_json(src_file)
+        # Merge each ELF's per-section string lists in place - one C-level
+        # list.extend per section, no second outer dict alongside the first.
+        for elf_path, features_dict in elf_to_features.items():
+            merged: list[str] = []
+            for instances in features_dict.values():
+                merged.extend(instances)
+            elf_to_features[elf_path] = {
+                'strings': merged,
                 'defined_functions': [],
                 'defined_objects': [],
             }
-            for elf_path, features_dict in elf_to_features.items()
-        }
 
     identifiers_from = str(src_file)
     rule_id_to_elf_path = {}
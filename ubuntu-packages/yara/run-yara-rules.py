@@ -2,25 +2,26 @@
 
 import argparse
 import contextlib
-import json
 import re
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from operator import itemgetter
 from pathlib import Path
 
 import numpy as np
+import orjson
 import yara
+from scipy.sparse import csr_matrix
 from sklearn.metrics import classification_report
-from sklearn.preprocessing import MultiLabelBinarizer
 from tqdm import tqdm
 
 AMD64_IDENTIFIERS_RE = re.compile(r'amd64|x86_64')
 ARM64_IDENTIFIERS_RE = re.compile(r'arm64|aarch64')
 
-YARA_ELF_PATH_RE = re.compile(r'\s*name\s*=\s*"(.*)"')
-
-ELF_PATH_REGEX = re.compile(r'(.*)/(.*_\$\{ARCH\}\.deb)-(.*)')
+# Matches the `name = "..."` meta line; searched over the raw rule bytes in
+# one pass instead of decoding and iterating the file line by line.
+YARA_ELF_PATH_RE = re.compile(rb'^\s*name\s*=\s*"(.*)"$', re.M)
 
 @dataclass(frozen=True)
 class ElfPath:
@@ -30,76 +31,118 @@ class ElfPath:
 
     @staticmethod
     def from_str(s: str) -> 'ElfPath':
-        match = ELF_PATH_REGEX.fullmatch(s)
-        source_pkg, binary_pkg, name = match.groups()
-        return ElfPath(source_pkg, binary_pkg, name)
+        # Two fixed-delimiter rpartitions instead of a backtracking regex;
+        # same split as the greedy '(.*)/(.*_\$\{ARCH\}\.deb)-(.*)' pattern.
+        head, sep, name = s.rpartition('_${ARCH}.deb-')
+        assert sep, s
+        source_pkg, _, binary_pkg_prefix = head.rpartition('/')
+        return ElfPath(source_pkg, binary_pkg_prefix + '_${ARCH}.deb', name)
 
     def __str__(self) -> str:
         return f'{self.source_pkg}/{self.binary_pkg}-{self.name}'
 
 
-def match_yara_rules(yarac_file: str, yara_dir: Path, elfs_dir: Path, log_file: Path | None) -> None:
-    yara_elf_name_to_path = defaultdict(list)
+def match_yara_rules(yarac_file: str | None, yara_dir: Path, elfs_dir: Path, log_file: Path | None) -> None:
+    # Rule candidates for an ELF, resolvable with O(1) dict lookups instead
+    # of filtering a per-name list in the hot loop: all rules sharing the
+    # ELF's source package and name, and the exact (source, binary, name)
+    # triple to disambiguate when there are several.
+    yara_elf_paths_by_source = defaultdict(list)
+    yara_elf_path_by_full_key: dict[tuple[str, str, str], ElfPath] = {}
     yara_elf_paths = []
 
     for yara_file in yara_dir.glob('**/*.yara'):
-        with open(yara_file, 'r', encoding='utf-8') as f:
-            found_name = False
-            for line in f:
-                m = YARA_ELF_PATH_RE.fullmatch(line.rstrip())
-                if m is not None:
-                    yara_elf_path_str = m.group(1)
-                    found_name = True
-                    break
-            if not found_name:
-                raise ValueError(f"name not found in {yara_file}")
+        m = YARA_ELF_PATH_RE.search(yara_file.read_bytes())
+        if m is None:
+            raise ValueError(f"name not found in {yara_file}")
+        yara_elf_path_str = m.group(1).decode('utf-8')
 
         yara_elf_path_arch_indep = AMD64_IDENTIFIERS_RE.sub('${ARCH}', yara_elf_path_str)
         yara_elf_paths.append(yara_elf_path_arch_indep)
 
         yara_elf_path = ElfPath.from_str(yara_elf_path_arch_indep)
-        yara_elf_name_to_path[yara_elf_path.name].append(yara_elf_path)
+        yara_elf_paths_by_source[yara_elf_path.source_pkg, yara_elf_path.name].append(yara_elf_path)
+        full_key = (yara_elf_path.source_pkg, yara_elf_path.binary_pkg, yara_elf_path.name)
+        assert full_key not in yara_elf_path_by_full_key, f'multiple rules for {yara_elf_path}'
+        yara_elf_path_by_full_key[full_key] = yara_elf_path
 
-    yara_elf_name_to_path: dict[str, list[ElfPath]] = dict(yara_elf_name_to_path)
+    yara_elf_paths_by_source: dict[tuple[str, str], list[ElfPath]] = dict(yara_elf_paths_by_source)
     yara_elf_paths.sort()
 
-    multilabel_binarizer = MultiLabelBinarizer()
-    multilabel_binarizer.fit([yara_elf_paths])
-
-    rules = yara.load(yarac_file)
+    label_to_idx = {label: idx for idx, label in enumerate(yara_elf_paths)}
+
+    def to_indicator_matrix(predictions: list[list[str]]) -> csr_matrix:
+        """Assemble the 0/1 label-indicator matrix for sklearn as CSR.
+
+        Stores only the (few) labels predicted per ELF instead of a dense
+        num_elfs x num_rules matrix.
+        """
+        indptr = np.zeros(len(predictions) + 1, dtype=np.int64)
+        indices: list[int] = []
+        for row, labels in enumerate(predictions, 1):
+            # CSR canonical form wants sorted, duplicate-free column indices.
+            indices.extend(sorted(label_to_idx[label] for label in set(labels)))
+            indptr[row] = len(indices)
+        data = np.ones(len(indices), dtype=np.int8)
+        return csr_matrix((data, np.asarray(indices, dtype=np.int64), indptr),
+                          shape=(len(predictions), len(yara_elf_paths)))
+
+    if yarac_file is not None:
+        rules = yara.load(yarac_file)
+    else:
+        # One in-process compilation instead of a separate yarac invocation
+        # and its round-trip through the filesystem; matches the strictness
+        # of compile-yara-rules.sh (--fail-on-warnings).
+        rules = yara.compile(
+            filepaths={yara_file.stem: str(yara_file) for yara_file in yara_dir.glob('**/*.yara')},
+            error_on_warning=True,
+        )
     elfs = [path for path in elfs_dir.glob('**/*') if path.is_file()]
     elfs.sort()
+    # Stringified once up front: the loop below (and each scan) would
+    # otherwise re-run the Path-to-str conversion and relative_to per ELF.
+    elf_strs = [str(elf_path) for elf_path in elfs]
+    rel_elf_strs = [str(elf_path.relative_to(elfs_dir)) for elf_path in elfs]
 
     expected_elfs_predictions = []
     actual_elfs_predictions = []
 
+    # The same rules match many ELFs, so normalize each rule name to its
+    # ${ARCH}-independent form once instead of re-running the regex per match.
+    arch_indep_rule_names: dict[str, str] = {}
+
+    def scan_elf(elf_path_str: str) -> list[tuple[str, int, int]]:
+        # Pull the three fields we use out of the match callback instead of
+        # keeping whole yara.Match objects (and their string-match lists)
+        # alive until the bookkeeping loop gets to them.
+        matched: list[tuple[str, int, int]] = []
+
+        def on_match(data: dict) -> int:
+            meta = data['meta']
+            matched.append((meta['name'], len(data['strings']), meta['total_identifiers']))
+            return yara.CALLBACK_CONTINUE
+
+        rules.match(elf_path_str, fast=True, callback=on_match, which_callbacks=yara.CALLBACK_MATCHES)
+        return matched
+
     if log_file:
-        log_f = open(log_file, 'w', encoding='utf-8')
+        log_f = open(log_file, 'w', encoding='utf-8', buffering=1024 * 1024)
     else:
         log_f = contextlib.nullcontext()
 
-    with log_f as log_f:
-        for elf_path in tqdm(elfs):
-            if log_f:
-                print(elf_path, file=log_f)
-                print('=' * 30, file=log_f)
-            rel_elf_path = elf_path.relative_to(elfs_dir)
-            elf_path_arch_indep = ARM64_IDENTIFIERS_RE.sub('${ARCH}', str(rel_elf_path))
+    # libyara releases the GIL while scanning, so a thread pool overlaps the
+    # CPU-bound matching across cores; executor.map keeps the results in input
+    # order and the bookkeeping/logging below stays sequential.
+    with log_f as log_f, ThreadPoolExecutor() as executor:
+        for elf_path_str, rel_elf_path, matches in tqdm(
+                zip(elf_strs, rel_elf_strs, executor.map(scan_elf, elf_strs)), total=len(elfs)):
+            elf_path_arch_indep = ARM64_IDENTIFIERS_RE.sub('${ARCH}', rel_elf_path)
             elf_path_parsed = ElfPath.from_str(elf_path_arch_indep)
-            if elf_path_parsed.name in yara_elf_name_to_path:
-                candidates = [
-                    yara_elf_path
-                    for yara_elf_path in yara_elf_name_to_path[elf_path_parsed.name]
-                    if elf_path_parsed.source_pkg == yara_elf_path.source_pkg
-                ]
-                if len(candidates) > 1:
-                    candidates = [
-                        yara_elf_path
-                        for yara_elf_path in candidates
-                        if elf_path_parsed.binary_pkg == yara_elf_path.binary_pkg
-                    ]
-            else:
-                candidates = []
+            candidates = yara_elf_paths_by_source.get((elf_path_parsed.source_pkg, elf_path_parsed.name), [])
+            if len(candidates) > 1:
+                yara_elf_path = yara_elf_path_by_full_key.get(
+                    (elf_path_parsed.source_pkg, elf_path_parsed.binary_pkg, elf_path_parsed.name))
+                candidates = [yara_elf_path] if yara_elf_path is not None else []
 
             assert len(candidates) in (0, 1)
             # if len(candidates) == 0:
@@ -109,42 +152,49 @@ def match_yara_rules(yarac_file: str, yara_dir: Path, elfs_dir: Path, log_file:
             actual_elfs_prediction = []
 
             matching_rules = []
-            matches = rules.match(str(elf_path), fast=True)
-            for match in matches:
-                actual_elfs_prediction.append(AMD64_IDENTIFIERS_RE.sub('${ARCH}', match.meta['name']))
+            for rule_name, num_matched, num_total in matches:
+                arch_indep_name = arch_indep_rule_names.get(rule_name)
+                if arch_indep_name is None:
+                    arch_indep_name = arch_indep_rule_names[rule_name] = AMD64_IDENTIFIERS_RE.sub('${ARCH}', rule_name)
+                actual_elfs_prediction.append(arch_indep_name)
 
                 if log_f:
-                    match_score = len(match.strings) / match.meta['total_identifiers']
-                    matching_rules.append((match.meta['name'], len(match.strings), match.meta['total_identifiers'], match_score))
+                    matching_rules.append((rule_name, num_matched, num_total, num_matched / num_total))
 
             actual_elfs_predictions.append(actual_elfs_prediction)
 
             if log_f:
                 matching_rules.sort(key=itemgetter(-1), reverse=True)
-                for rule_id, num_matched, num_total, match_score in matching_rules:
-                    print(f"{rule_id} - {num_matched}/{num_total} = {match_score:.1%}", file=log_f)
-                print(file=log_f)
+                # One write per ELF instead of a print per rule.
+                lines = [elf_path_str, '=' * 30]
+                lines.extend(f"{rule_id} - {num_matched}/{num_total} = {match_score:.1%}"
+                             for rule_id, num_matched, num_total, match_score in matching_rules)
+                lines.append('')
+                log_f.write('\n'.join(lines) + '\n')
 
-    expected_elfs_bin = multilabel_binarizer.transform(expected_elfs_predictions)
-    actual_elfs_bin = multilabel_binarizer.transform(actual_elfs_predictions)
+    expected_elfs_bin = to_indicator_matrix(expected_elfs_predictions)
+    actual_elfs_bin = to_indicator_matrix(actual_elfs_predictions)
 
     with open('yara-rules-classification-report.log', 'w', encoding='utf-8') as f:
         f.write(
             classification_report(expected_elfs_bin, actual_elfs_bin, output_dict=False, target_names=yara_elf_paths, zero_division=np.nan),
         )
         f.write('\n')
-    with open('yara-rules-classification-report.json', 'w', encoding='utf-8') as f:
-        json.dump(
+    with open('yara-rules-classification-report.json', 'wb') as f:
+        # orjson writes NaN scores (from zero_division=np.nan) as null, which
+        # unlike json.dump's bare NaN literal is actually valid JSON.
+        f.write(orjson.dumps(
             classification_report(expected_elfs_bin, actual_elfs_bin, output_dict=True, target_names=yara_elf_paths, zero_division=np.nan),
-            f, ensure_ascii=False, allow_nan=True, indent=2)
+            option=orjson.OPT_INDENT_2))
 
     return
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Match YARA rules against extracted ELFs and calculate evaluation metrics")
     parser.add_argument('elfs_dir', type=Path)
-    parser.add_argument('-C', '--yarac', dest='yarac_file', required=True,
-                        help="path to a file with compiled YARA rules", metavar='YARAC_FILE')
+    parser.add_argument('-C', '--yarac', dest='yarac_file', required=False,
+                        help="path to a file with compiled YARA rules"
+                             " (default: compile the rules from --yara-dir in-process)", metavar='YARAC_FILE')
     parser.add_argument('-y', '--yara-dir', dest='yara_dir', type=Path, required=True,
                         help="directory with YARA rules", metavar='DIR')
     parser.add_argument('-l', '--log', dest='log_file', type=Path, required=False,